@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+from transaction_matching import exclude_transfers
+
+
+def _monthly_outflow_cents(df):
+    """Group a set of rows into outflow cents per (Month, Category)"""
+    if df is None or df.empty or "Date" not in df.columns:
+        return pd.Series(dtype=np.int64)
+    df = exclude_transfers(df)
+    if "Outflow" in df.columns:
+        outflow = pd.to_numeric(df["Outflow"], errors="coerce").fillna(0.0)
+    elif "Amount" in df.columns:
+        # Legacy format - treat all amounts as outflows
+        outflow = pd.to_numeric(df["Amount"], errors="coerce").fillna(0.0).abs()
+    else:
+        return pd.Series(dtype=np.int64)
+    frame = pd.DataFrame({
+        "Month": pd.to_datetime(df["Date"], errors="coerce").dt.strftime("%Y-%m").to_numpy(),
+        "Category": df["Category"].astype(str).to_numpy() if "Category" in df.columns else "Uncategorized",
+        "Cents": np.rint(outflow.to_numpy() * 100).astype(np.int64),
+    })
+    frame = frame[frame["Month"].notna() & (frame["Cents"] > 0)]
+    return frame.groupby(["Month", "Category"])["Cents"].sum()
+
+
+class RunningTotals:
+    """Outflow per (month, category), kept current by adding and subtracting the rows that changed.
+
+    Building from a frame is O(rows) once; afterwards every append, edit, delete or
+    recategorization only touches the changed rows, and reading a month is O(categories).
+    Amounts are kept in integer cents so repeated deltas don't drift.
+    """
+
+    def __init__(self):
+        self.cents = {}
+
+    @classmethod
+    def from_frame(cls, df):
+        totals = cls()
+        totals.add(df)
+        return totals
+
+    def add(self, df, sign=1):
+        """Add the outflow of the given rows (sign=-1 subtracts it)"""
+        for (month, category), cents in _monthly_outflow_cents(df).items():
+            month_totals = self.cents.setdefault(month, {})
+            month_totals[category] = month_totals.get(category, 0) + sign * int(cents)
+            if month_totals[category] == 0:
+                del month_totals[category]
+
+    def subtract(self, df):
+        self.add(df, sign=-1)
+
+    def replace(self, old_df, new_df):
+        """Apply an edit: remove the old version of the rows and add the new one"""
+        self.subtract(old_df)
+        self.add(new_df)
+
+    def months(self):
+        return set(self.cents)
+
+    def month(self, month):
+        """Return {category: spent} for a month in dollars"""
+        return {category: cents / 100 for category, cents in self.cents.get(month, {}).items()}
+
+
+def budget_status(budgets, month_spent):
+    """Compare monthly budgets with spend-to-date. Costs O(categories).
+
+    Returns a list of dicts with Category, Budget, Spent, Remaining and Progress (0-1+).
+    """
+    status = []
+    for category, budget in budgets.items():
+        if not budget or budget <= 0:
+            continue
+        spent = month_spent.get(category, 0.0)
+        status.append({
+            "Category": category,
+            "Budget": float(budget),
+            "Spent": spent,
+            "Remaining": float(budget) - spent,
+            "Progress": spent / float(budget),
+        })
+    return sorted(status, key=lambda row: row["Progress"], reverse=True)
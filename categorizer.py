@@ -0,0 +1,33 @@
+from rule_engine import RuleEngine, keyword_rules
+
+MODEL_RULE = "Model"
+MANUAL_RULE = "Manual"   # set when a category is changed by hand in an editor
+
+
+def categorize_frame(df, categories, model=None, rules=None):
+    """Set df["Category"] and df["Rule"] (which rule decided each row). Returns df.
+
+    Precedence, highest first:
+      1. explicit rules (rules.json) - resolved by priority, see RuleEngine
+      2. the category keyword lists, compiled into one merchant rule per category;
+         when several categories match, the last one in dict order wins
+      3. confident predictions of the learned model (NaiveBayesCategorizer), if given
+
+    Keywords are only added for merchants the model can't place (or places wrongly), so a
+    keyword hit is a deliberate choice and the model only fills in rows nothing else matched.
+    """
+    # Keyword rules go first so explicit rules win ties at the same priority
+    engine = RuleEngine(keyword_rules(categories) + list(rules or []))
+    category, rule = engine.categorize(df)
+
+    if model is not None and len(model) and "Merchant" in df.columns:
+        predicted, confidence = model.predict(df["Merchant"])
+        # Ignore predictions for categories that have since been removed
+        confident = (confidence >= model.min_confidence) & predicted.isin(list(categories))
+        use_model = confident & rule.isna()
+        category = category.mask(use_model, predicted)
+        rule = rule.mask(use_model, MODEL_RULE)
+
+    df["Category"] = category.fillna("Uncategorized")
+    df["Rule"] = rule.fillna("")
+    return df
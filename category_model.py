@@ -0,0 +1,136 @@
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+from merchant_normalizer import normalize_merchants
+
+ALPHA = 0.5            # additive smoothing for unseen (token, category) pairs
+MIN_CONFIDENCE = 0.8   # below this posterior the keyword rules decide
+
+
+@lru_cache(maxsize=100000)
+def merchant_tokens(merchant):
+    """Word unigrams and bigrams of a canonical merchant name"""
+    words = merchant.split()
+    return tuple(words + [f"{a} {b}" for a, b in zip(words, words[1:])])
+
+
+def _labelled_pairs(df):
+    """Count rows per (canonical merchant, category), skipping uncategorized rows"""
+    if df is None or df.empty or "Merchant" not in df.columns or "Category" not in df.columns:
+        return pd.Series(dtype=np.int64)
+    frame = pd.DataFrame({
+        "Merchant": normalize_merchants(df["Merchant"]).to_numpy(),
+        "Category": df["Category"].to_numpy(),
+    })
+    frame = frame[(frame["Merchant"] != "") & frame["Category"].notna() & (frame["Category"] != "Uncategorized")]
+    return frame.groupby(["Merchant", "Category"]).size()
+
+
+class NaiveBayesCategorizer:
+    """Multinomial naive Bayes over merchant word n-grams, trained on categorized transactions.
+
+    Counts are kept per category so corrections and appends are learned by adding and
+    subtracting the rows that changed, like the budget running totals. Scoring compiles
+    the counts into a log-probability matrix once and scores every distinct merchant of a
+    batch with numpy.
+    """
+
+    def __init__(self, alpha=ALPHA, min_confidence=MIN_CONFIDENCE):
+        self.alpha = alpha
+        self.min_confidence = min_confidence
+        self.token_counts = {}   # category -> {token: count}
+        self.row_counts = {}     # category -> labelled rows
+        self._compiled = None
+
+    @classmethod
+    def from_frame(cls, df, **kwargs):
+        model = cls(**kwargs)
+        model.learn(df)
+        return model
+
+    def __len__(self):
+        return sum(self.row_counts.values())
+
+    def learn(self, df, sign=1):
+        """Learn the (Merchant, Category) pairs of the given rows (sign=-1 forgets them)"""
+        for (merchant, category), rows in _labelled_pairs(df).items():
+            counts = self.token_counts.setdefault(category, {})
+            for token in merchant_tokens(merchant):
+                counts[token] = counts.get(token, 0) + sign * int(rows)
+                if counts[token] <= 0:
+                    del counts[token]
+            self.row_counts[category] = self.row_counts.get(category, 0) + sign * int(rows)
+            if self.row_counts[category] <= 0:
+                del self.row_counts[category]
+                self.token_counts.pop(category, None)
+        self._compiled = None
+
+    def forget(self, df):
+        self.learn(df, sign=-1)
+
+    def replace(self, old_df, new_df):
+        """Apply an edit: forget the old version of the rows and learn the new one"""
+        self.forget(old_df)
+        self.learn(new_df)
+
+    def _compile(self):
+        if self._compiled is None:
+            categories = sorted(self.row_counts)
+            vocabulary = {}
+            for category in categories:
+                for token in self.token_counts.get(category, {}):
+                    vocabulary.setdefault(token, len(vocabulary))
+            counts = np.zeros((len(categories), len(vocabulary)))
+            for i, category in enumerate(categories):
+                category_counts = self.token_counts.get(category, {})
+                if category_counts:
+                    counts[i, [vocabulary[t] for t in category_counts]] = list(category_counts.values())
+            log_prior = np.log(np.array([self.row_counts[c] for c in categories], dtype=float))
+            log_likelihood = np.log(counts + self.alpha) - np.log(
+                counts.sum(axis=1, keepdims=True) + self.alpha * max(len(vocabulary), 1)
+            )
+            self._compiled = (categories, vocabulary, log_prior - np.log(max(len(self), 1)), log_likelihood)
+        return self._compiled
+
+    def predict(self, merchants):
+        """Return (category, confidence) Series aligned with merchants.
+
+        Merchants with no known token get "Uncategorized" and confidence 0.
+        """
+        merchants = pd.Series(merchants)
+        result = pd.Series("Uncategorized", index=merchants.index, dtype=object)
+        confidence = pd.Series(0.0, index=merchants.index)
+        categories, vocabulary, log_prior, log_likelihood = self._compile()
+        if not categories or merchants.empty:
+            return result, confidence
+
+        codes, uniques = pd.factorize(normalize_merchants(merchants))
+        rows, columns = [], []
+        for i, merchant in enumerate(uniques):
+            for token in merchant_tokens(merchant):
+                column = vocabulary.get(token)
+                if column is not None:
+                    rows.append(i)
+                    columns.append(column)
+        rows = np.asarray(rows, dtype=np.int64)
+        columns = np.asarray(columns, dtype=np.int64)
+
+        scores = np.tile(log_prior, (len(uniques), 1))
+        np.add.at(scores, rows, log_likelihood[:, columns].T)
+        scores -= scores.max(axis=1, keepdims=True)
+        probabilities = np.exp(scores)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+
+        best = probabilities.argmax(axis=1)
+        best_confidence = probabilities.max(axis=1)
+        best_confidence[np.bincount(rows, minlength=len(uniques)) == 0] = 0.0
+
+        matched = codes >= 0
+        result[matched] = np.asarray(categories, dtype=object)[best[codes[matched]]]
+        confidence[matched] = best_confidence[codes[matched]]
+        return result, confidence
+
+    def knows(self, merchant, category):
+        """True if the model already puts this merchant in category with enough confidence"""
+        predicted, confidence = self.predict([merchant])
+        return predicted.iloc[0] == category and confidence.iloc[0] >= self.min_confidence
@@ -3,11 +3,15 @@ import time
 import pandas as pd
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
+from merchant_normalizer import normalize_merchants
+from storage import atomic_write
+from date_parsing import SourceProfiles
 
 # === CONFIGURATION ===
 WATCH_FOLDER = r"C:\Users\SalihAl-Tak\OneDrive - adam-tools.com\Desktop\Bank_statements\CIBC"
 OUTPUT_FOLDER = r"C:\Users\SalihAl-Tak\OneDrive - adam-tools.com\Desktop\Bank_statements\PROCESSED"
 processed_files = {}
+profiles = SourceProfiles()  # the CIBC date format is detected once and kept in source_profiles.json
 
 # === CLEANING FUNCTION ===
 def clean_cibc_csv(file_path):
@@ -39,19 +43,22 @@ def clean_cibc_csv(file_path):
     df = df[(df["Outflow"] != 0) | (df["Inflow"] != 0)]
 
     # Convert date column
-    df["Date"] = pd.to_datetime(df["Date"], errors="coerce")
+    df["Date"] = profiles.parse(df["Date"], "CIBC")
+    for warning in profiles.pop_warnings():
+        print(f"⚠️ {warning}")
 
     # Clean up and select final columns - keep separate Inflow and Outflow
     df = df[["Date", "Description", "Inflow", "Outflow"]].dropna()
 
     # Add source identifier and merchant column
     df["Source"] = "CIBC"
-    df["Merchant"] = df["Description"]  # Use description as merchant for now
+    df["Merchant"] = normalize_merchants(df["Description"])  # Canonical merchant from the description
 
     # Save cleaned CSV
     base_name = os.path.splitext(os.path.basename(file_path))[0]
     output_path = os.path.join(OUTPUT_FOLDER, f"{base_name}_cibc_cleaned.csv")
-    df.to_csv(output_path, index=False)
+    # Write atomically so the dashboard never picks up a half-written file
+    atomic_write(output_path, lambda path: df.to_csv(path, index=False))
 
     print(f"✅ Cleaned CIBC CSV saved to: {output_path}")
     print(f"📊 Processed {len(df)} transactions")
@@ -0,0 +1,185 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from storage import update_json
+
+PROFILES_FILE = "source_profiles.json"
+RAW = "raw"           # statements as the bank exports them (watchers)
+CLEANED = "cleaned"   # cleaned CSVs written by the watchers - ISO dates (dashboard, API)
+PROFILE_FIELDS = {RAW: "date_format", CLEANED: "cleaned_date_format"}
+
+# Tried when a source's format is unknown; the one that parses most of the sample wins, earlier on ties
+CANDIDATE_FORMATS = [
+    "ISO8601",       # 2025-01-31, 2025-01-31 00:00:00, 2025-01-31T00:00:00 (cleaned CSVs, master data)
+    "%m/%d/%Y",
+    "%d/%m/%Y",
+    "%m/%d/%y",
+    "%d/%m/%y",
+    "%d %b %Y",      # 31 Jan 2025 (AMEX, after removing dots)
+    "%b %d, %Y",
+    "%d-%b-%Y",
+    "%d-%b-%y",
+    "%Y/%m/%d",
+]
+DEFAULT_PROFILES = {
+    "AMEX": {"date_format": "%d %b %Y"},
+}
+SAMPLE_SIZE = 200
+MIN_PARSED_SHARE = 0.9  # leaves room for stray rows like "Total" without accepting a wrong day/month order
+CACHE_LIMIT = 200000
+
+_parsed = {}  # (format, text) -> datetime64[ns], shared by every parse in the process
+
+
+def _sample(values):
+    """Distinct non-empty date strings to test formats against"""
+    texts = pd.Series(values).dropna().astype(str).str.strip()
+    return texts[texts != ""].drop_duplicates().head(SAMPLE_SIZE)
+
+
+def _parsed_share(sample, fmt):
+    return pd.to_datetime(sample, format=fmt, errors="coerce").notna().mean()
+
+
+def detect_date_format(values, preferred=None):
+    """Return the format that parses the largest share of the sampled values, or None.
+
+    preferred (e.g. the source's stored format) wins ties.
+    """
+    sample = _sample(values)
+    if sample.empty:
+        return preferred
+    best, best_share = None, MIN_PARSED_SHARE
+    for fmt in dict.fromkeys([preferred] + CANDIDATE_FORMATS if preferred else CANDIDATE_FORMATS):
+        share = _parsed_share(sample, fmt)
+        if share == 1.0:
+            return fmt
+        if share > best_share or (best is None and share >= best_share):
+            best, best_share = fmt, share
+    return best
+
+
+def parse_dates(values, fmt=None):
+    """Parse a Series of dates with an explicit format, once per distinct string. Returns a datetime Series.
+
+    Values that are already datetimes are returned as they are. Without fmt the format is
+    detected from a sample; when nothing fits, pandas inference is used as before.
+    Unparseable values become NaT.
+    """
+    values = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    fmt = fmt or detect_date_format(values)
+    if fmt is None:
+        return pd.to_datetime(values, errors="coerce")
+
+    codes, uniques = pd.factorize(values.astype(str).str.strip().where(values.notna()), sort=False)
+    # Look up into a local dict - another thread may clear the shared cache at any moment
+    known = {text: _parsed.get((fmt, text)) for text in uniques}
+    missing = [text for text, value in known.items() if value is None]
+    if missing:
+        parsed = pd.to_datetime(pd.Series(missing, dtype=object), format=fmt, errors="coerce").to_numpy(dtype="datetime64[ns]")
+        known.update(zip(missing, parsed))
+        if len(_parsed) + len(missing) > CACHE_LIMIT:
+            _parsed.clear()
+        _parsed.update(zip(((fmt, text) for text in missing), parsed))
+    # Missing values get code -1, which picks the trailing NaT
+    lookup = np.array([known[text] for text in uniques] + [np.datetime64("NaT")], dtype="datetime64[ns]")
+    return pd.Series(lookup[codes], index=values.index, name=values.name)
+
+
+def _day_month_order(fmt):
+    """"dm" or "md" for formats with a numeric month, None when the month is a name"""
+    if fmt == "ISO8601":
+        return "md"
+    if "%m" not in fmt or "%d" not in fmt:
+        return None
+    return "dm" if fmt.index("%d") < fmt.index("%m") else "md"
+
+
+class SourceProfiles:
+    """Per-source statement settings kept in source_profiles.json - for now the date formats.
+
+    A source has one format for its raw statements (what the watchers read) and one for the
+    cleaned CSVs (what the dashboard and the API read). Each is detected from the first file
+    it appears in and reused for every later one. A stored format is replaced only when it
+    stops fitting, and never by one with the opposite day/month order - that is reported in
+    warnings instead, since rows imported earlier were read the stored way.
+    """
+
+    def __init__(self, path=PROFILES_FILE):
+        self.path = path
+        self.profiles = {source: dict(profile) for source, profile in DEFAULT_PROFILES.items()}
+        self.warnings = []
+        self.reload()
+
+    def reload(self):
+        """Pick up formats other processes have recorded since"""
+        if os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                for source, profile in json.load(f).items():
+                    self.profiles.setdefault(source, {}).update(profile)
+
+    def record(self, source, field, fmt):
+        """Store a detected format, checked against and merged into the latest file.
+
+        Other processes' entries are kept. Returns the format stored for the source afterwards,
+        which stays the old one when the new format would swap day and month.
+        """
+        def merge(profiles):
+            profiles = profiles or {}
+            stored = profiles.get(source, {}).get(field, self.profiles.get(source, {}).get(field))
+            orders = (_day_month_order(stored), _day_month_order(fmt)) if stored else (None, None)
+            if None not in orders and orders[0] != orders[1]:
+                self.warnings.append(
+                    f"{source}: dates fit {fmt} rather than the stored {stored} (day and month swapped). "
+                    f"This file was read as {fmt}; check the earlier {source} rows and fix "
+                    f"{field} in {self.path}."
+                )
+                fmt_to_store = stored
+            else:
+                fmt_to_store = fmt
+            profiles[source] = {**profiles.get(source, {}), field: fmt_to_store}
+            return profiles
+        for name, profile in update_json(self.path, merge, indent=2, sort_keys=True).items():
+            self.profiles.setdefault(name, {}).update(profile)
+        return self.profiles[source][field]
+
+    def pop_warnings(self):
+        """Return the warnings collected since the last call and forget them"""
+        warnings, self.warnings = self.warnings, []
+        return warnings
+
+    def date_format(self, source, values, kind=RAW):
+        """Return the date format of a source for one kind of input, detecting and recording it when unknown"""
+        field = PROFILE_FIELDS[kind]
+        fmt = self.profiles.get(source, {}).get(field)
+        detected = detect_date_format(values, preferred=fmt)
+        if detected is not None and detected != fmt and source:
+            # Another process may have recorded this source meanwhile - decide against its format
+            self.reload()
+            if self.profiles.get(source, {}).get(field) != fmt:
+                fmt = self.profiles[source][field]
+                detected = detect_date_format(values, preferred=fmt)
+            if detected != fmt:
+                self.record(source, field, detected)
+        return detected
+
+    def parse(self, values, source=None, kind=RAW):
+        """Parse a date column of one source with its known format"""
+        values = pd.Series(values)
+        if pd.api.types.is_datetime64_any_dtype(values):
+            return values
+        return parse_dates(values, self.date_format(source, values, kind))
+
+    def parse_frame(self, df, kind=CLEANED):
+        """Parse df["Date"] per Source, so statements from several accounts each use their own format"""
+        if "Source" not in df.columns:
+            return self.parse(df["Date"], kind=kind)
+        if pd.api.types.is_datetime64_any_dtype(df["Date"]):
+            return df["Date"]
+        dates = pd.Series(pd.NaT, index=df.index, dtype="datetime64[ns]", name="Date")
+        for source, rows in df.groupby(df["Source"].fillna(""), sort=False).groups.items():
+            dates[rows] = self.parse(df.loc[rows, "Date"], source or None, kind).to_numpy()
+        return dates
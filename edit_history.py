@@ -0,0 +1,178 @@
+import numpy as np
+import pandas as pd
+
+MAX_HISTORY = 100
+
+
+def _changed(before, after):
+    """Element-wise "value differs" for two aligned Series, treating missing == missing"""
+    both_missing = before.isna().to_numpy() & after.isna().to_numpy()
+    try:
+        equal = (before == after).fillna(False).to_numpy(dtype=bool)
+    except TypeError:
+        # Incomparable dtypes (e.g. dates against strings) - compare the text instead
+        equal = (before.astype(str) == after.astype(str)).to_numpy()
+    return ~(equal | both_missing)
+
+
+class ChangeSet:
+    """The difference between two versions of a frame, keyed on the row index.
+
+    Holds only what changed: the deleted rows, the added rows and, per column, the old and
+    new values of the edited cells - so its size follows the edit, not the frame.
+    """
+
+    def __init__(self, label, deleted, added, cells, columns_before, columns_after):
+        self.label = label
+        self.deleted = deleted          # rows as they were before the edit
+        self.added = added              # rows as they are after the edit
+        self.cells = cells              # column -> DataFrame(Before, After) indexed by row
+        self.columns_before = columns_before
+        self.columns_after = columns_after
+
+    @classmethod
+    def between(cls, before, after, label=""):
+        """Diff two versions of a frame whose index identifies the rows"""
+        deleted = before.loc[before.index.difference(after.index)]
+        added = after.loc[after.index.difference(before.index)]
+        common = before.index.intersection(after.index)
+        cells = {}
+        for column in dict.fromkeys(list(before.columns) + list(after.columns)):
+            old = before.loc[common, column] if column in before.columns else pd.Series(np.nan, index=common)
+            new = after.loc[common, column] if column in after.columns else pd.Series(np.nan, index=common)
+            mask = _changed(old, new)
+            if mask.any():
+                cells[column] = pd.DataFrame({"Before": old[mask], "After": new[mask]})
+        return cls(label, deleted, added, cells, list(before.columns), list(after.columns))
+
+    def __bool__(self):
+        return bool(len(self.deleted) or len(self.added) or self.cells)
+
+    @property
+    def rows(self):
+        """Index labels of every row the edit touched"""
+        labels = [self.deleted.index, self.added.index] + [cells.index for cells in self.cells.values()]
+        return labels[0].append(labels[1:]).unique()
+
+    def summary(self):
+        edited = len(pd.Index([]).append([cells.index for cells in self.cells.values()]).unique()) if self.cells else 0
+        parts = [f"{count} {what}" for count, what in [(edited, "edited"), (len(self.added), "added"), (len(self.deleted), "deleted")] if count]
+        return ", ".join(parts) or "no changes"
+
+    def _set_cells(self, df, side):
+        columns = self.columns_after if side == "After" else self.columns_before
+        for column, cells in self.cells.items():
+            if column not in columns:
+                continue   # dropped by the reindex anyway
+            if column not in df.columns:
+                df[column] = pd.Series(np.nan, index=df.index, dtype=cells[side].dtype)
+            df.loc[cells.index, column] = cells[side].to_numpy()
+        return df
+
+    def apply(self, df):
+        """Move a frame from the version before this edit to the one after it"""
+        df = self._set_cells(df.drop(index=self.deleted.index), "After")
+        df = pd.concat([df, self.added]) if len(self.added) else df
+        return df.reindex(columns=self.columns_after).sort_index()
+
+    def revert(self, df):
+        """Move a frame from the version after this edit back to the one before it"""
+        df = self._set_cells(df.drop(index=self.added.index), "Before")
+        df = pd.concat([df, self.deleted]) if len(self.deleted) else df
+        return df.reindex(columns=self.columns_before).sort_index()
+
+    def diff(self):
+        """Long-format view of the edit: one line per changed cell, added row or deleted row"""
+        lines = [
+            pd.DataFrame({"Row": cells.index, "Change": "Edited", "Column": column,
+                          "Before": cells["Before"].astype(str).to_numpy(), "After": cells["After"].astype(str).to_numpy()})
+            for column, cells in self.cells.items()
+        ]
+        for change, rows in [("Added", self.added), ("Deleted", self.deleted)]:
+            if len(rows):
+                described = rows.astype(str).agg(" | ".join, axis=1)
+                lines.append(pd.DataFrame({
+                    "Row": rows.index, "Change": change, "Column": "",
+                    "Before": described.to_numpy() if change == "Deleted" else "",
+                    "After": described.to_numpy() if change == "Added" else "",
+                }))
+        if not lines:
+            return pd.DataFrame(columns=["Row", "Change", "Column", "Before", "After"])
+        return pd.concat(lines, ignore_index=True).sort_values(["Row", "Change"], kind="stable", ignore_index=True)
+
+
+class EditHistory:
+    """Undo/redo history of the session frame.
+
+    Only the current version is kept as a frame; every commit is stored as a ChangeSet, and
+    undo/redo move the current frame along them. Rows are identified by their index, which
+    must stay stable across edits (new rows get new labels).
+
+    Past max_history edits the oldest one is dropped, and version 0 becomes the oldest version
+    still reachable rather than the upload - see reaches_original().
+    """
+
+    def __init__(self, df, label="Uploaded", max_history=MAX_HISTORY):
+        self.current = df.sort_index()
+        self.label = label
+        self.max_history = max_history
+        self.undo_stack = []   # change sets up to the current version, oldest first
+        self.redo_stack = []   # undone change sets, most recently undone last
+        self.dropped = 0       # edits dropped from the start of the history
+
+    @property
+    def version(self):
+        return len(self.undo_stack)
+
+    def can_undo(self):
+        return bool(self.undo_stack)
+
+    def can_redo(self):
+        return bool(self.redo_stack)
+
+    def reaches_original(self):
+        """True while undoing every edit still leads back to the frame the history started from"""
+        return self.dropped == 0
+
+    def commit(self, df, label):
+        """Record df as the next version. Returns its ChangeSet, or None if nothing changed."""
+        df = df.sort_index()
+        change = ChangeSet.between(self.current, df, label)
+        if not change:
+            return None
+        self.undo_stack.append(change)
+        self.redo_stack.clear()
+        if len(self.undo_stack) > self.max_history:
+            # The oldest edit can't be undone any more; the current frame already includes it
+            self.undo_stack.pop(0)
+            self.dropped += 1
+        self.current = df
+        return change
+
+    def undo(self):
+        """Step back one version. Returns the ChangeSet that was undone."""
+        change = self.undo_stack.pop()
+        self.current = change.revert(self.current)
+        self.redo_stack.append(change)
+        return change
+
+    def redo(self):
+        """Re-apply the last undone edit. Returns its ChangeSet."""
+        change = self.redo_stack.pop()
+        self.current = change.apply(self.current)
+        self.undo_stack.append(change)
+        return change
+
+    def entries(self):
+        """[(version, label, summary, is_current)] from the oldest reachable version to the newest redoable edit"""
+        if self.dropped:
+            entries = [(0, "Oldest kept version", f"{self.label} + {self.dropped} older edits", self.version == 0)]
+        else:
+            entries = [(0, self.label, "", self.version == 0)]
+        for version, change in enumerate(self.undo_stack + self.redo_stack[::-1], start=1):
+            entries.append((version, change.label, change.summary(), version == self.version))
+        return entries
+
+    def change(self, version):
+        """The ChangeSet that produced a version (1-based)"""
+        return (self.undo_stack + self.redo_stack[::-1])[version - 1]
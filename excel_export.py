@@ -0,0 +1,165 @@
+from datetime import datetime
+import pandas as pd
+import openpyxl
+from openpyxl.styles import Font, PatternFill, Alignment
+from openpyxl.utils.dataframe import dataframe_to_rows
+from date_parsing import parse_dates
+from storage import atomic_write
+from transaction_matching import exclude_transfers
+
+
+def build_master_excel(transactions_df, path, progress=None):
+    """Create or update the master Excel file with monthly summary.
+
+    progress, if given, is called as progress(fraction, message) while the workbook is built.
+    Returns the monthly summary DataFrame.
+    """
+    progress = progress or (lambda fraction, message: None)
+    if transactions_df.empty:
+        raise ValueError("No transaction data available to export.")
+    
+    # Get current month/year
+    current_date = datetime.now()
+    current_month = current_date.strftime("%Y-%m")
+    
+    # Calculate monthly totals - transfers between accounts are neither inflow nor outflow
+    progress(0.1, "Calculating monthly totals")
+    df = exclude_transfers(transactions_df).copy()
+    
+    # Ensure Date column is datetime
+    if "Date" in df.columns:
+        df["Date"] = parse_dates(df["Date"])
+        df["Month"] = df["Date"].dt.to_period('M').astype(str)
+    else:
+        df["Month"] = current_month
+    
+    # Handle separate Inflow/Outflow columns or legacy Amount column
+    if "Inflow" in df.columns and "Outflow" in df.columns:
+        # New format with separate columns
+        outflow_df = df[["Month", "Outflow"]].copy()
+        inflow_df = df[["Month", "Inflow"]].copy()
+        
+        # Group by month
+        monthly_outflow = outflow_df.groupby("Month")["Outflow"].sum().reset_index()
+        monthly_inflow = inflow_df.groupby("Month")["Inflow"].sum().reset_index()
+        
+        # Rename columns for consistency
+        monthly_outflow = monthly_outflow.rename(columns={"Outflow": "Amount"})
+        monthly_inflow = monthly_inflow.rename(columns={"Inflow": "Amount"})
+        
+    else:
+        # Legacy format - treat all amounts as outflows
+        if "Amount" not in df.columns:
+            raise ValueError("No Amount column found in the data. Cannot create master Excel file.")
+            
+        outflow_df = df.copy()
+        outflow_df["Amount"] = outflow_df["Amount"].abs()  # Make positive for display
+        
+        # No inflow for now
+        inflow_df = pd.DataFrame(columns=["Month", "Amount"])  # Empty dataframe
+        
+        # Group by month
+        monthly_outflow = outflow_df.groupby("Month")["Amount"].sum().reset_index()
+        monthly_inflow = inflow_df.groupby("Month")["Amount"].sum().reset_index()
+    
+    # Create master summary
+    master_data = []
+    
+    # Get all unique months
+    all_months = sorted(set(monthly_outflow["Month"].tolist() + monthly_inflow["Month"].tolist()))
+    
+    for month in all_months:
+        outflow_amount = monthly_outflow[monthly_outflow["Month"] == month]["Amount"].sum()
+        inflow_amount = monthly_inflow[monthly_inflow["Month"] == month]["Amount"].sum()
+        net_amount = inflow_amount - outflow_amount
+        
+        master_data.append({
+            "Month": month,
+            "Outflow": outflow_amount,
+            "Inflow": inflow_amount,
+            "Net": net_amount
+        })
+    
+    # Add current month if not exists
+    if current_month not in [row["Month"] for row in master_data]:
+        outflow_amount = monthly_outflow[monthly_outflow["Month"] == current_month]["Amount"].sum()
+        inflow_amount = monthly_inflow[monthly_inflow["Month"] == current_month]["Amount"].sum()
+        net_amount = inflow_amount - outflow_amount
+        
+        master_data.append({
+            "Month": current_month,
+            "Outflow": outflow_amount,
+            "Inflow": inflow_amount,
+            "Net": net_amount
+        })
+    
+    # Create DataFrame
+    master_df = pd.DataFrame(master_data)
+    master_df = master_df.sort_values("Month")
+    
+    # Create Excel file with multiple sheets
+    wb = openpyxl.Workbook()
+    
+    # Remove default sheet
+    wb.remove(wb.active)
+    
+    # Create Master Summary sheet
+    ws_summary = wb.create_sheet("Master Summary")
+    
+    # Add headers
+    headers = ["Month", "Outflow (CAD)", "Inflow (CAD)", "Net (CAD)"]
+    for col, header in enumerate(headers, 1):
+        cell = ws_summary.cell(row=1, column=col, value=header)
+        cell.font = Font(bold=True)
+        cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+        cell.alignment = Alignment(horizontal="center")
+    
+    # Add data
+    for row_idx, row in master_df.iterrows():
+        ws_summary.cell(row=row_idx+2, column=1, value=row["Month"])
+        ws_summary.cell(row=row_idx+2, column=2, value=row["Outflow"])
+        ws_summary.cell(row=row_idx+2, column=3, value=row["Inflow"])
+        ws_summary.cell(row=row_idx+2, column=4, value=row["Net"])
+    
+    # Format numbers
+    for row in range(2, len(master_df) + 2):
+        for col in range(2, 5):
+            cell = ws_summary.cell(row=row, column=col)
+            cell.number_format = '"$"#,##0.00'
+    
+    # Create Transaction Details sheet
+    progress(0.4, "Writing transaction details")
+    ws_transactions = wb.create_sheet("Transaction Details")
+    
+    # Add transaction data
+    transaction_df = transactions_df.copy()
+    transaction_df = transaction_df.sort_values("Date", ascending=False)
+    
+    for r in dataframe_to_rows(transaction_df, index=False, header=True):
+        ws_transactions.append(r)
+    
+    # Format transaction sheet headers
+    for cell in ws_transactions[1]:
+        cell.font = Font(bold=True)
+        cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+    
+    # Auto-adjust column widths
+    progress(0.7, "Formatting columns")
+    for ws in [ws_summary, ws_transactions]:
+        for column in ws.columns:
+            max_length = 0
+            column_letter = column[0].column_letter
+            for cell in column:
+                try:
+                    if len(str(cell.value)) > max_length:
+                        max_length = len(str(cell.value))
+                except:
+                    pass
+            adjusted_width = min(max_length + 2, 50)
+            ws.column_dimensions[column_letter].width = adjusted_width
+    
+    # Save the file - atomically, so a download never gets a half-written workbook
+    progress(0.9, "Saving workbook")
+    atomic_write(path, wb.save)
+    progress(1.0, "Done")
+    return master_df
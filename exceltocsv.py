@@ -4,6 +4,9 @@ import pandas as pd
 import xlwings as xw
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
+from merchant_normalizer import normalize_merchants
+from storage import atomic_write
+from date_parsing import SourceProfiles
 
 # === USER CONFIGURATION ===
 WATCH_FOLDER = r"C:\Users\SalihAl-Tak\OneDrive - adam-tools.com\Desktop\Bank_statements\AMEX"
@@ -11,6 +14,7 @@ OUTPUT_FOLDER = r"C:\Users\SalihAl-Tak\OneDrive - adam-tools.com\Desktop\Bank_st
 
 # === RECENT FILES TRACKER FOR DEBOUNCING ===
 processed_files = {}
+profiles = SourceProfiles()  # AMEX dates are "31 Jan 2025" unless source_profiles.json says otherwise
 
 # === FUNCTION TO PROCESS .XLS FILE ===
 def process_xls(file_path):
@@ -42,19 +46,22 @@ def process_xls(file_path):
                 .str.strip()
             )
             df["Amount"] = pd.to_numeric(df["Amount"], errors="coerce")
-            # For AMEX credit card, all amounts are outflows
-            df["Outflow"] = df["Amount"].abs()  # All AMEX transactions are outflows
-            df["Inflow"] = 0  # No inflows for credit card
+            # AMEX charges are positive; payments and refunds are negative credits
+            df["Outflow"] = df["Amount"].clip(lower=0)
+            df["Inflow"] = (-df["Amount"]).clip(lower=0)
 
         # Clean and parse 'Date' column
         if "Date" in df.columns:
-            df["Date"] = df["Date"].astype(str).str.replace(".", "", regex=False)
-            df["Date"] = pd.to_datetime(df["Date"], format="%d %b %Y", errors="coerce")
+            df["Date"] = df["Date"].astype(str).str.replace(".", "", regex=False).where(df["Date"].notna())
+            df["Date"] = profiles.parse(df["Date"], "AMEX")
+            for warning in profiles.pop_warnings():
+                print(f"⚠️ {warning}")
 
         # Add source identifier and merchant column
         df["Source"] = "AMEX"
         if "Merchant" not in df.columns:
-            df["Merchant"] = "AMEX Transaction"  # Default merchant name
+            df["Merchant"] = df["Description"] if "Description" in df.columns else "AMEX Transaction"
+        df["Merchant"] = normalize_merchants(df["Merchant"])  # Canonical merchant name
 
         # Select final columns - keep separate Inflow and Outflow
         final_columns = ["Date", "Description", "Inflow", "Outflow", "Source", "Merchant"]
@@ -63,7 +70,8 @@ def process_xls(file_path):
         # Save cleaned data as CSV
         base_name = os.path.splitext(os.path.basename(file_path))[0]
         output_path = os.path.join(OUTPUT_FOLDER, f"{base_name}_amex_cleaned.csv")
-        df.to_csv(output_path, index=False)
+        # Write atomically so the dashboard never picks up a half-written file
+        atomic_write(output_path, lambda path: df.to_csv(path, index=False))
         print(f"✅ Saved to: {output_path}")
 
     except Exception as e:
@@ -0,0 +1,311 @@
+import argparse
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import pandas as pd
+from categorizer import categorize_frame
+from category_model import NaiveBayesCategorizer
+from date_parsing import SourceProfiles
+from merchant_normalizer import normalize_merchants
+from partitioned_store import PartitionedStore, StoreConflict
+from query_engine import TransactionIndex
+from rule_engine import RULES_FILE
+from shared_snapshot import read_master
+from transaction_matching import non_transfer_mask
+from transactions import read_statement, prepare_transactions, merge_into_master
+
+# === CONFIGURATION ===
+CATEGORY_FILE = "categories.json"
+TRANSACTIONS_DIR = "transactions_data"
+DEFAULT_HOST = "127.0.0.1"   # local only - the API has no authentication
+DEFAULT_PORT = 8765
+STREAM_CHUNK_ROWS = 2000
+
+
+# === ENGINE ===
+class FinanceEngine:
+    """Long-lived engine behind the HTTP API and CLI.
+
+    Categories, rules, the master data, its query index and the category model stay loaded
+    between requests and are only reloaded when their JSON files change or the store moves to a
+    new snapshot.
+    """
+
+    def __init__(self, store_root=TRANSACTIONS_DIR, category_file=CATEGORY_FILE, rules_file=RULES_FILE):
+        self.store = PartitionedStore(store_root)
+        self.category_file = category_file
+        self.rules_file = rules_file
+        self.profiles = SourceProfiles()
+        self._json_files = {}   # path -> (mtime, data)
+        self._master_snapshot = None
+        self._master_df = pd.DataFrame()
+        self._index = None
+        self._model = NaiveBayesCategorizer()
+        self.lock = threading.Lock()
+        self.append_lock = threading.Lock()   # one append at a time; other processes are caught by StoreConflict
+
+    def _load_json(self, path, default):
+        """Return the contents of a JSON file, re-reading it only when its mtime changed"""
+        mtime = os.path.getmtime(path) if os.path.exists(path) else None
+        cached = self._json_files.get(path)
+        if cached is None or cached[0] != mtime:
+            data = default
+            if mtime is not None:
+                with open(path, "r") as f:
+                    data = json.load(f)
+            self._json_files[path] = cached = (mtime, data)
+        return cached[1]
+
+    def categories(self):
+        return self._load_json(self.category_file, {"Uncategorized": []})
+
+    def rules(self):
+        return self._load_json(self.rules_file, [])
+
+    def _load_master(self):
+        """Return (master_df, query index, catalog snapshot it was read from), reloading on a new version.
+
+        The snapshot is captured under the same lock as the frame - store.snapshot itself is
+        replaced by any other request thread's refresh or write.
+        """
+        with self.lock:
+            snapshot = self.store.refresh()
+            if self._master_snapshot is None or snapshot["version"] != self._master_snapshot["version"]:
+                self._master_df = read_master(self.store)
+                if self._master_df.empty:
+                    self._index = None
+                else:
+                    # Index the shared snapshot in place - transfers are masked out, not copied away
+                    self._index = TransactionIndex(self._master_df, include=non_transfer_mask(self._master_df))
+                self._model = NaiveBayesCategorizer.from_frame(self._master_df)
+                self._master_snapshot = snapshot
+            return self._master_df, self._index, self._master_snapshot
+
+    def master(self):
+        """Return (master_df, query index over non-transfer rows) for the latest snapshot"""
+        master_df, index, _ = self._load_master()
+        return master_df, index
+
+    def model(self):
+        """Category model trained on the latest snapshot"""
+        self.master()
+        return self._model
+
+    def categorize(self, merchants):
+        """Categorize raw merchant strings in one vectorized batch"""
+        df = pd.DataFrame({"Merchant": list(merchants)})
+        result = categorize_frame(df.copy(), self.categories(), self.model(), self.rules())
+        return pd.DataFrame({
+            "Merchant": df["Merchant"],
+            "Canonical": normalize_merchants(df["Merchant"]),
+            "Category": result["Category"],
+            "Rule": result["Rule"],
+        })
+
+    def aggregate(self, start=None, end=None, by="Month", category=None, source=None):
+        """Inflow/Outflow totals grouped by a date bucket or column, transfers excluded"""
+        _, index = self.master()
+        if index is None:
+            return pd.DataFrame(columns=[by, "Inflow", "Outflow", "Count"])
+        query = index.query().between(start, end)
+        if category:
+            query = query.where(Category=category)
+        if source:
+            query = query.where(Source=source)
+        result = query.group_by(by, columns=["Inflow", "Outflow"])
+        if "Inflow" in result.columns and "Outflow" in result.columns:
+            result["Net"] = result["Inflow"] - result["Outflow"]
+        return result
+
+    def append_files(self, paths):
+        """Load cleaned statement CSVs or OFX/QFX files, merge them into the master data and commit"""
+        model = self.model()
+        frames = [prepare_transactions(read_statement(path), self.categories(), model, self.profiles, self.rules()) for path in paths]
+        incoming_df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        if incoming_df.empty:
+            return {"appended": 0, "duplicates_replaced": 0, "partitions": 0}
+
+        with self.append_lock:
+            for attempt in range(3):
+                # Merge onto exactly the snapshot master_df came from, so a concurrent append is a conflict
+                master_df, _, base = self._load_master()
+                merged_df, old_rows_df, new_rows_df, duplicate_count = merge_into_master(master_df, incoming_df)
+                changed = set(self.store.partition_keys(old_rows_df)) | set(self.store.partition_keys(new_rows_df))
+                try:
+                    # store.write replaces store.snapshot, which _load_master reads under the same lock
+                    with self.lock:
+                        committed = self.store.write(merged_df, changed, base=base)
+                except StoreConflict:
+                    # Someone else committed to the same partitions - merge again on top of their data
+                    continue
+                return {
+                    "appended": int(len(incoming_df) - duplicate_count),
+                    "duplicates_replaced": int(duplicate_count),
+                    "partitions": len(changed),
+                    "version": committed["version"],
+                    "warnings": self.profiles.pop_warnings(),
+                }
+            raise StoreConflict(changed)
+
+
+# === STREAMING OUTPUT ===
+def iter_records(df, fmt="ndjson", chunk_rows=STREAM_CHUNK_ROWS):
+    """Yield a DataFrame as encoded NDJSON or CSV chunks, a few thousand rows at a time"""
+    for start in range(0, max(len(df), 1), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows]
+        if fmt == "csv":
+            yield chunk.to_csv(index=False, header=(start == 0), date_format="%Y-%m-%d").encode("utf-8")
+        elif not chunk.empty:
+            yield (chunk.to_json(orient="records", lines=True, date_format="iso").rstrip("\n") + "\n").encode("utf-8")
+
+
+# === HTTP API ===
+class FinanceRequestHandler(BaseHTTPRequestHandler):
+    """Routes:
+        GET  /health                              engine status
+        POST /categorize   {"merchants": [...]}   or one merchant per line (text/plain)
+        GET  /aggregates   ?start=&end=&by=Month|Week|Day|Year|Category|Source|Merchant&category=&source=
+        POST /append       {"files": ["...cleaned.csv", "...statement.ofx", ...]}
+    Table responses stream as NDJSON (default) or CSV with ?format=csv.
+    """
+
+    protocol_version = "HTTP/1.1"
+    engine = None
+
+    def log_message(self, format, *args):
+        print(f"[API] {self.address_string()} {format % args}")
+
+    def _query(self):
+        return {key: values[-1] for key, values in parse_qs(urlparse(self.path).query).items()}
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return self.rfile.read(length) if length else b""
+
+    def _send_json(self, data, status=200):
+        body = json.dumps(data, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self, df, fmt):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/csv" if fmt == "csv" else "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for chunk in iter_records(df, fmt):
+            self.wfile.write(f"{len(chunk):X}\r\n".encode("ascii") + chunk + b"\r\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def do_GET(self):
+        route = urlparse(self.path).path
+        params = self._query()
+        try:
+            if route == "/health":
+                master_df, _ = self.engine.master()
+                self._send_json({"status": "ok", "transactions": len(master_df), "version": self.engine.store.version})
+            elif route == "/aggregates":
+                result = self.engine.aggregate(
+                    start=params.get("start"),
+                    end=params.get("end"),
+                    by=params.get("by", "Month"),
+                    category=params.get("category"),
+                    source=params.get("source"),
+                )
+                self._stream(result, params.get("format", "ndjson"))
+            else:
+                self._send_json({"error": f"Unknown route {route}"}, status=404)
+        except (KeyError, ValueError) as e:
+            self._send_json({"error": str(e)}, status=400)
+        except Exception as e:
+            self._send_json({"error": str(e)}, status=500)
+
+    def do_POST(self):
+        route = urlparse(self.path).path
+        params = self._query()
+        try:
+            body = self._body()
+            if route == "/categorize":
+                if self.headers.get("Content-Type", "").startswith("application/json"):
+                    merchants = json.loads(body)["merchants"]
+                else:
+                    merchants = [line for line in body.decode("utf-8").splitlines() if line.strip()]
+                self._stream(self.engine.categorize(merchants), params.get("format", "ndjson"))
+            elif route == "/append":
+                self._send_json(self.engine.append_files(json.loads(body)["files"]))
+            else:
+                self._send_json({"error": f"Unknown route {route}"}, status=404)
+        except StoreConflict as e:
+            self._send_json({"error": str(e)}, status=409)
+        except (KeyError, ValueError, FileNotFoundError) as e:
+            self._send_json({"error": str(e)}, status=400)
+        except Exception as e:
+            self._send_json({"error": str(e)}, status=500)
+
+
+def serve(engine, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    handler = type("Handler", (FinanceRequestHandler,), {"engine": engine})
+    server = ThreadingHTTPServer((host, port), handler)
+    print(f"🚀 Finance API listening on http://{host}:{port}")
+    master_df, _ = engine.master()
+    print(f"📁 {len(master_df)} transactions loaded")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+
+
+# === CLI ===
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless access to the finance engine")
+    parser.add_argument("--data", default=TRANSACTIONS_DIR, help="master data directory")
+    parser.add_argument("--categories", default=CATEGORY_FILE, help="categories JSON file")
+    parser.add_argument("--rules", default=RULES_FILE, help="categorization rules JSON file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="run the HTTP API with a warm engine")
+    serve_parser.add_argument("--host", default=DEFAULT_HOST)
+    serve_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+
+    categorize_parser = commands.add_parser("categorize", help="categorize merchants, one per line")
+    categorize_parser.add_argument("file", nargs="?", default="-", help="input file, - for stdin")
+    categorize_parser.add_argument("--format", choices=["ndjson", "csv"], default="csv")
+
+    aggregates_parser = commands.add_parser("aggregates", help="Inflow/Outflow totals for a date range")
+    aggregates_parser.add_argument("--start")
+    aggregates_parser.add_argument("--end")
+    aggregates_parser.add_argument("--by", default="Month")
+    aggregates_parser.add_argument("--category", action="append")
+    aggregates_parser.add_argument("--source", action="append")
+    aggregates_parser.add_argument("--format", choices=["ndjson", "csv"], default="csv")
+
+    append_parser = commands.add_parser("append", help="append cleaned statement CSVs or OFX/QFX files to the master data")
+    append_parser.add_argument("files", nargs="+")
+
+    args = parser.parse_args(argv)
+    engine = FinanceEngine(args.data, args.categories, args.rules)
+
+    if args.command == "serve":
+        serve(engine, args.host, args.port)
+    elif args.command == "categorize":
+        source = sys.stdin if args.file == "-" else open(args.file, "r")
+        with source:
+            merchants = [line.rstrip("\n") for line in source if line.strip()]
+        for chunk in iter_records(engine.categorize(merchants), args.format):
+            sys.stdout.buffer.write(chunk)
+    elif args.command == "aggregates":
+        result = engine.aggregate(args.start, args.end, args.by, args.category, args.source)
+        for chunk in iter_records(result, args.format):
+            sys.stdout.buffer.write(chunk)
+    elif args.command == "append":
+        print(json.dumps(engine.append_files(args.files)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from categorizer import categorize_frame, MANUAL_RULE
+from category_model import NaiveBayesCategorizer
+from excel_export import build_master_excel
+from merchant_normalizer import canonical_merchant_column
+from partitioned_store import PartitionedStore, StoreConflict
+from shared_snapshot import read_master
+from transaction_matching import flag_transfers
+
+RECATEGORIZE_CHUNK_ROWS = 50000
+COMMIT_ATTEMPTS = 3   # reload-and-redo rounds when another writer commits to the same partitions
+RULE_INPUT_COLUMNS = ["Merchant", "Description", "Inflow", "Outflow", "Amount", "Source"]
+
+
+class Job:
+    """Status of one background job, updated by the worker thread and read by the UI"""
+
+    def __init__(self, kind, key, label):
+        self.id = uuid.uuid4().hex[:8]
+        self.kind = kind
+        self.key = key
+        self.label = label
+        self.status = "queued"   # queued -> running -> done / failed
+        self.progress = 0.0
+        self.message = "Waiting for a worker"
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.finished_at = None
+
+    @property
+    def active(self):
+        return self.status in ("queued", "running")
+
+    def report(self, fraction, message=""):
+        """Progress callback handed to the job function"""
+        self.progress = max(0.0, min(float(fraction), 1.0))
+        if message:
+            self.message = message
+
+
+class JobRunner:
+    """Thread pool plus a registry of jobs, shared by every Streamlit session.
+
+    Submitting a job whose key matches a queued or running job returns that job
+    instead of starting a second copy.
+    """
+
+    def __init__(self, max_workers=2, history=50):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="finance-job")
+        self.history = history
+        self.registry = {}
+        self.lock = threading.Lock()
+
+    def submit(self, kind, func, *args, key=None, label=None, **kwargs):
+        """Run func(*args, progress=job.report, **kwargs) in the background and return its Job"""
+        key = key or kind
+        with self.lock:
+            for job in self.registry.values():
+                if job.key == key and job.active:
+                    return job
+            job = Job(kind, key, label or kind)
+            self.registry[job.id] = job
+            self._trim()
+        self.executor.submit(self._run, job, func, args, kwargs)
+        return job
+
+    def _run(self, job, func, args, kwargs):
+        job.status = "running"
+        job.message = "Started"
+        try:
+            job.result = func(*args, progress=job.report, **kwargs)
+            job.progress = 1.0
+            job.status = "done"
+            job.message = "Finished"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            job.message = traceback.format_exc(limit=3)
+        finally:
+            job.finished_at = time.time()
+
+    def _trim(self):
+        """Forget the oldest finished jobs beyond the history limit"""
+        finished = sorted((j for j in self.registry.values() if not j.active), key=lambda j: j.submitted_at)
+        for job in finished[:max(0, len(self.registry) - self.history)]:
+            del self.registry[job.id]
+
+    def get(self, job_id):
+        return self.registry.get(job_id)
+
+    def jobs(self, kind=None):
+        """Return jobs, newest first"""
+        with self.lock:
+            jobs = [j for j in self.registry.values() if kind is None or j.kind == kind]
+        return sorted(jobs, key=lambda j: j.submitted_at, reverse=True)
+
+
+# === JOB FUNCTIONS ===
+# Each works on its own snapshot of the store and commits through it, so a job never
+# touches session state and sessions pick up the result as a new snapshot.
+
+def export_master_excel(store_root, path, progress):
+    """Build the master Excel workbook from the latest snapshot"""
+    progress(0.05, "Loading master data")
+    store = PartitionedStore(store_root)
+    master_df = build_master_excel(read_master(store), path, progress=lambda f, m: progress(0.05 + 0.9 * f, m))
+    with open(path, "rb") as f:
+        data = f.read()
+    return {"path": path, "summary": master_df, "data": data, "version": store.version}
+
+
+def _rewrite_master(store_root, progress, update):
+    """Load the latest snapshot, apply update(df) and commit the partitions of the rows it changed.
+
+    update changes df in place and returns a boolean Series of the changed rows. If another
+    writer (a session or the API) commits to one of those partitions in the meantime, the
+    update is redone on top of its data, up to COMMIT_ATTEMPTS times.
+    """
+    store = PartitionedStore(store_root)
+    for attempt in range(COMMIT_ATTEMPTS):
+        progress(0.05, "Loading master data" if attempt == 0 else "Master data changed meanwhile - reloading")
+        base = store.refresh()
+        df = read_master(store)
+        if df.empty:
+            return {"changed_rows": 0, "partitions": 0}
+
+        changed = update(df)
+        progress(0.85, f"Saving {int(changed.sum()):,} changed rows")
+        partitions = set(store.partition_keys(df[changed]))
+        try:
+            if partitions:
+                store.write(df, partitions, base=base)
+        except StoreConflict:
+            continue
+        return {"changed_rows": int(changed.sum()), "partitions": len(partitions)}
+    raise StoreConflict(partitions)
+
+
+def recategorize_all(store_root, categories, progress, rules=None, override_manual=False):
+    """Re-run the categorization rules, learned model and keywords over the whole master data and commit the changed partitions.
+
+    Rows categorized by hand (Rule "Manual") keep their category unless override_manual is set.
+    """
+    def update(df):
+        before = {
+            column: df[column].astype(str) if column in df.columns else pd.Series("", index=df.index)
+            for column in ["Category", "Rule"]
+        }
+        # Rules and keywords beat the model, so it only places merchants nothing else matches
+        progress(0.08, "Training the category model")
+        model = NaiveBayesCategorizer.from_frame(df)
+        columns = [c for c in RULE_INPUT_COLUMNS if c in df.columns]
+        chunks = []
+        for start in range(0, len(df), RECATEGORIZE_CHUNK_ROWS):
+            chunk = df.iloc[start:start + RECATEGORIZE_CHUNK_ROWS][columns].copy()
+            chunks.append(categorize_frame(chunk, categories, model, rules)[["Category", "Rule"]])
+            done = min(start + RECATEGORIZE_CHUNK_ROWS, len(df))
+            progress(0.1 + 0.7 * done / len(df), f"Categorized {done:,} of {len(df):,} rows")
+        result = pd.concat(chunks)
+
+        # Only a new Category is a change - rows that keep theirs keep their Rule too, so the job
+        # doesn't rewrite partitions just to relabel which rule agreed with the stored category
+        changed = result["Category"].astype(str) != before["Category"]
+        if not override_manual:
+            changed &= before["Rule"] != MANUAL_RULE
+        df["Category"] = result["Category"].where(changed, df.get("Category"))
+        df["Rule"] = result["Rule"].where(changed, before["Rule"])
+        return changed
+
+    return _rewrite_master(store_root, progress, update)
+
+
+def backfill_master(store_root, progress):
+    """Bring older master rows up to date: canonical merchants and transfer flags"""
+    def update(df):
+        before = df.copy()
+
+        progress(0.3, "Normalizing merchants")
+        merchants = canonical_merchant_column(df)
+        if merchants is not None:
+            df["Merchant"] = merchants
+
+        progress(0.6, "Matching transfers")
+        df["Transfer"] = flag_transfers(df)
+
+        changed = pd.Series(False, index=df.index)
+        for column in ["Merchant", "Transfer"]:
+            if column in df.columns:
+                if column in before.columns:
+                    changed |= df[column].astype(str) != before[column].astype(str)
+                else:
+                    changed |= True
+        return changed
+
+    return _rewrite_master(store_root, progress, update)
@@ -3,16 +3,34 @@ import pandas as pd
 import plotly.express as px
 import json
 import os
+import time
 from datetime import datetime
-import openpyxl
-from openpyxl.styles import Font, PatternFill, Alignment
-from openpyxl.utils.dataframe import dataframe_to_rows
+from query_engine import TransactionIndex
+from trends import build_rollups, trend_series
+from merchant_normalizer import normalize_merchant, canonical_keywords
+from transaction_matching import non_transfer_mask, match_transfers
+from subscriptions import detect_recurring, update_recurring
+from budgets import RunningTotals, budget_status
+from edit_history import EditHistory
+from category_model import NaiveBayesCategorizer
+from date_parsing import SourceProfiles, parse_dates
+from rule_engine import RuleEngine, clean_rule
+from categorizer import MANUAL_RULE
+from partitioned_store import PartitionedStore, StoreConflict
+from shared_snapshot import read_master, publish_snapshot
+from storage import locked_write_json, update_json
+from transactions import read_statement, prepare_transactions, merge_into_master
+from jobs import JobRunner, export_master_excel, recategorize_all, backfill_master
 
 st.set_page_config(page_title="Simple Finance App", page_icon="💸", layout="wide")
 
 category_file = "categories.json"
-transactions_file = "transactions_data.json"
+budget_file = "budgets.json"
+rules_file = "rules.json"
+transactions_file = "transactions_data.json"  # legacy single-file history, migrated on first run
+transactions_dir = "transactions_data"
 master_excel_file = "master_finance_tracker.xlsx"
+profiles_file = "source_profiles.json"
 
 # Load categories
 if "categories" not in st.session_state:
@@ -23,29 +41,98 @@ if "categories" not in st.session_state:
 if os.path.exists(category_file):
     with open(category_file, "r") as f:
         st.session_state.categories = json.load(f)
+    # Learned keywords key on the canonical merchant
+    st.session_state.categories = {
+        category: canonical_keywords(keywords)
+        for category, keywords in st.session_state.categories.items()
+    }
+
+# Load monthly budgets per category
+if "budgets" not in st.session_state:
+    st.session_state.budgets = {}
+
+if os.path.exists(budget_file):
+    with open(budget_file, "r") as f:
+        st.session_state.budgets = json.load(f)
+
+# Load explicit categorization rules
+if "rules" not in st.session_state:
+    st.session_state.rules = []
+
+if os.path.exists(rules_file):
+    with open(rules_file, "r") as f:
+        st.session_state.rules = json.load(f)
+
+# Date formats per Source, detected once and reused for every later statement
+if "source_profiles" not in st.session_state:
+    st.session_state.source_profiles = SourceProfiles(profiles_file)
+
+# Master data is partitioned by Source and month
+store = PartitionedStore(transactions_dir)
+
+def load_master_data():
+    """Load the master data from the latest store snapshot and drop everything derived from the old one"""
+    store.refresh()
+    try:
+        st.session_state.transactions_df = read_master(store)
+        st.session_state.data_loaded = not st.session_state.transactions_df.empty
+    except:
+        st.session_state.transactions_df = pd.DataFrame()
+        st.session_state.data_loaded = False
+    st.session_state.store_snapshot = store.snapshot
+    for key in ["master_totals", "subscriptions_df", "category_model"]:
+        st.session_state.pop(key, None)
 
 # Load transactions data from previous sessions
 if "transactions_df" not in st.session_state:
-    if os.path.exists(transactions_file):
+    if not store.catalog and os.path.exists(transactions_file):
+        # One-time migration of the single-file history into partitions
         try:
-            transactions_data = pd.read_json(transactions_file)
-            st.session_state.transactions_df = transactions_data
-            st.session_state.data_loaded = True
+            store.write(pd.read_json(transactions_file), base=store.snapshot)
         except:
-            st.session_state.transactions_df = pd.DataFrame()
-            st.session_state.data_loaded = False
-    else:
-        st.session_state.transactions_df = pd.DataFrame()
-        st.session_state.data_loaded = False
+            pass
+    load_master_data()
+elif st.session_state.get("store_snapshot", {}).get("version") != store.version:
+    # Another session or a watcher committed new data - move to the new snapshot
+    load_master_data()
+
+def update_categories(change):
+    """Apply change(categories) to the latest categories.json under its lock and keep the result.
+
+    Other sessions may have added keywords since this run loaded the file - they are kept.
+    """
+    def apply(categories):
+        categories = {category: canonical_keywords(keywords) for category, keywords in (categories or {"Uncategorized": []}).items()}
+        change(categories)
+        return categories
+    st.session_state.categories = update_json(category_file, apply)
+
+def update_budgets(change):
+    """Apply change(budgets) to the latest budgets.json under its lock and keep the result"""
+    def apply(budgets):
+        budgets = budgets or {}
+        change(budgets)
+        return budgets
+    st.session_state.budgets = update_json(budget_file, apply)
 
-def save_categories():
-    with open(category_file, "w") as f:
-        json.dump(st.session_state.categories, f)
+def save_rules():
+    locked_write_json(rules_file, st.session_state.rules, indent=2)
 
-def save_transactions():
-    """Save current transactions to file for persistence"""
+def save_transactions(changed_partitions=None):
+    """Save current transactions to the partitioned store, rewriting only the changed partitions.
+
+    Raises StoreConflict if another session changed one of those partitions since our snapshot.
+    """
     if hasattr(st.session_state, 'transactions_df') and not st.session_state.transactions_df.empty:
-        st.session_state.transactions_df.to_json(transactions_file, orient='records', date_format='iso')
+        base = st.session_state.get("store_snapshot")
+        committed = store.write(st.session_state.transactions_df, changed_partitions, base=base)
+        if base is not None and committed["version"] != base["version"] + 1:
+            # Others committed to different partitions in between - reload to pick up their rows
+            load_master_data()
+        else:
+            st.session_state.store_snapshot = committed
+            # Our frame is exactly the new version - publish it and switch to the shared mapping
+            st.session_state.transactions_df = publish_snapshot(store, st.session_state.transactions_df)
         return True
     return False
 
@@ -54,216 +141,290 @@ def append_to_persistent_data():
     if not hasattr(st.session_state, 'current_session_df') or st.session_state.current_session_df.empty:
         st.warning("No current session data to append.")
         return False
-    
-    if st.session_state.transactions_df.empty:
-        # No existing data, just save current session
-        st.session_state.transactions_df = st.session_state.current_session_df.copy()
-    else:
-        # Merge with existing data and remove duplicates
-        merged_df = pd.concat([st.session_state.transactions_df, st.session_state.current_session_df], ignore_index=True)
-        merged_df = merged_df.drop_duplicates(subset=['Date', 'Merchant', 'Amount'], keep='last')
-        st.session_state.transactions_df = merged_df
-    
-    save_transactions()
-    return True
 
-def create_master_excel():
-    """Create or update the master Excel file with monthly summary"""
-    if not hasattr(st.session_state, 'transactions_df') or st.session_state.transactions_df.empty:
-        st.warning("No transaction data available to export.")
-        return
-    
-    # Get current month/year
-    current_date = datetime.now()
-    current_month = current_date.strftime("%Y-%m")
-    
-    # Calculate monthly totals
-    df = st.session_state.transactions_df.copy()
-    
-    # Ensure Date column is datetime
-    if "Date" in df.columns:
-        df["Date"] = pd.to_datetime(df["Date"], errors="coerce")
-        df["Month"] = df["Date"].dt.to_period('M').astype(str)
-    else:
-        df["Month"] = current_month
-    
-    # Handle separate Inflow/Outflow columns or legacy Amount column
-    if "Inflow" in df.columns and "Outflow" in df.columns:
-        # New format with separate columns
-        outflow_df = df[["Month", "Outflow"]].copy()
-        inflow_df = df[["Month", "Inflow"]].copy()
-        
-        # Group by month
-        monthly_outflow = outflow_df.groupby("Month")["Outflow"].sum().reset_index()
-        monthly_inflow = inflow_df.groupby("Month")["Inflow"].sum().reset_index()
-        
-        # Rename columns for consistency
-        monthly_outflow = monthly_outflow.rename(columns={"Outflow": "Amount"})
-        monthly_inflow = monthly_inflow.rename(columns={"Inflow": "Amount"})
-        
-    else:
-        # Legacy format - treat all amounts as outflows
-        if "Amount" not in df.columns:
-            st.error("❌ No Amount column found in the data. Cannot create master Excel file.")
-            return
-            
-        outflow_df = df.copy()
-        outflow_df["Amount"] = outflow_df["Amount"].abs()  # Make positive for display
-        
-        # No inflow for now
-        inflow_df = pd.DataFrame(columns=["Month", "Amount"])  # Empty dataframe
-        
-        # Group by month
-        monthly_outflow = outflow_df.groupby("Month")["Amount"].sum().reset_index()
-        monthly_inflow = inflow_df.groupby("Month")["Amount"].sum().reset_index()
-    
-    # Create master summary
-    master_data = []
-    
-    # Get all unique months
-    all_months = sorted(set(monthly_outflow["Month"].tolist() + monthly_inflow["Month"].tolist()))
-    
-    for month in all_months:
-        outflow_amount = monthly_outflow[monthly_outflow["Month"] == month]["Amount"].sum()
-        inflow_amount = monthly_inflow[monthly_inflow["Month"] == month]["Amount"].sum()
-        net_amount = inflow_amount - outflow_amount
-        
-        master_data.append({
-            "Month": month,
-            "Outflow": outflow_amount,
-            "Inflow": inflow_amount,
-            "Net": net_amount
-        })
-    
-    # Add current month if not exists
-    if current_month not in [row["Month"] for row in master_data]:
-        outflow_amount = monthly_outflow[monthly_outflow["Month"] == current_month]["Amount"].sum()
-        inflow_amount = monthly_inflow[monthly_inflow["Month"] == current_month]["Amount"].sum()
-        net_amount = inflow_amount - outflow_amount
-        
-        master_data.append({
-            "Month": current_month,
-            "Outflow": outflow_amount,
-            "Inflow": inflow_amount,
-            "Net": net_amount
-        })
-    
-    # Create DataFrame
-    master_df = pd.DataFrame(master_data)
-    master_df = master_df.sort_values("Month")
-    
-    # Create Excel file with multiple sheets
-    wb = openpyxl.Workbook()
-    
-    # Remove default sheet
-    wb.remove(wb.active)
-    
-    # Create Master Summary sheet
-    ws_summary = wb.create_sheet("Master Summary")
-    
-    # Add headers
-    headers = ["Month", "Outflow (CAD)", "Inflow (CAD)", "Net (CAD)"]
-    for col, header in enumerate(headers, 1):
-        cell = ws_summary.cell(row=1, column=col, value=header)
-        cell.font = Font(bold=True)
-        cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        cell.alignment = Alignment(horizontal="center")
-    
-    # Add data
-    for row_idx, row in master_df.iterrows():
-        ws_summary.cell(row=row_idx+2, column=1, value=row["Month"])
-        ws_summary.cell(row=row_idx+2, column=2, value=row["Outflow"])
-        ws_summary.cell(row=row_idx+2, column=3, value=row["Inflow"])
-        ws_summary.cell(row=row_idx+2, column=4, value=row["Net"])
-    
-    # Format numbers
-    for row in range(2, len(master_df) + 2):
-        for col in range(2, 5):
-            cell = ws_summary.cell(row=row, column=col)
-            cell.number_format = '"$"#,##0.00'
-    
-    # Create Transaction Details sheet
-    ws_transactions = wb.create_sheet("Transaction Details")
-    
-    # Add transaction data
-    transaction_df = st.session_state.transactions_df.copy()
-    transaction_df = transaction_df.sort_values("Date", ascending=False)
-    
-    for r in dataframe_to_rows(transaction_df, index=False, header=True):
-        ws_transactions.append(r)
-    
-    # Format transaction sheet headers
-    for cell in ws_transactions[1]:
-        cell.font = Font(bold=True)
-        cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    
-    # Auto-adjust column widths
-    for ws in [ws_summary, ws_transactions]:
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
-    
-    # Save the file
-    wb.save(master_excel_file)
-    return master_df
+    for attempt in range(3):
+        try:
+            return merge_session_into_master()
+        except StoreConflict:
+            # Another session appended to the same partitions - merge again on top of its data
+            load_master_data()
+    st.error("❌ Master data is busy, please try again.")
+    return False
+
+def merge_session_into_master():
+    """Merge the current session into the master data and commit the changed partitions"""
+    merged_df, old_rows_df, new_rows_df, duplicate_count = merge_into_master(
+        st.session_state.transactions_df,
+        st.session_state.current_session_df
+    )
+    if duplicate_count > 0:
+        st.toast(f"Replaced {duplicate_count} duplicate transaction(s)")
+    st.session_state.transactions_df = merged_df
+
+    # Update the budget running totals by delta
+    if "master_totals" in st.session_state:
+        st.session_state.master_totals.replace(old_rows_df, new_rows_df)
 
-def categorize_transactions(df):
-    df["Category"] = "Uncategorized"
+    # Learn the appended rows; pending editor corrections are part of them now
+    clear_category_corrections()
+    if "category_model" in st.session_state:
+        st.session_state.category_model.replace(old_rows_df, new_rows_df)
+
+    # Re-run subscription detection only for the merchants in this session
+    if "subscriptions_df" in st.session_state and "Merchant" in st.session_state.current_session_df.columns:
+        st.session_state.subscriptions_df = update_recurring(
+            st.session_state.subscriptions_df,
+            merged_df,
+            st.session_state.current_session_df["Merchant"].unique()
+        )
     
-    for category, keywords in st.session_state.categories.items():
-        if category == "Uncategorized" or not keywords:
-            continue
-        
-        lowered_keywords = [keyword.lower().strip() for keyword in keywords]
-        
-        for idx, row in df.iterrows():
-            merchant = str(row["Merchant"]).lower().strip()
-            if any(keyword in merchant for keyword in lowered_keywords):
-                df.at[idx, "Category"] = category
-                
-    return df
+    # Only the partitions holding changed rows are rewritten
+    changed_partitions = set(store.partition_keys(old_rows_df)) | set(store.partition_keys(new_rows_df))
+    save_transactions(changed_partitions)
+    return True
 
 def load_transactions(file):
     try:
-        df = pd.read_csv(file)
-        
-        # Convert Date column to datetime if it exists
-        if "Date" in df.columns:
-            df["Date"] = pd.to_datetime(df["Date"], errors="coerce")
-        
-        # Handle different CSV formats
-        if "Inflow" in df.columns and "Outflow" in df.columns:
-            # New format with separate Inflow/Outflow columns
-            pass  # Keep as is
-        elif "Amount" in df.columns:
-            # Legacy format - convert to separate columns
-            df["Inflow"] = df[df["Amount"] > 0]["Amount"].fillna(0)
-            df["Outflow"] = df[df["Amount"] < 0]["Amount"].abs().fillna(0)
-        else:
-            st.error("Unsupported CSV format. Expected columns: Date, Description, Inflow, Outflow")
-            return None
-            
-        return categorize_transactions(df)
+        df = read_statement(file)
+        df = prepare_transactions(
+            df, st.session_state.categories, get_category_model(), st.session_state.source_profiles,
+            st.session_state.rules
+        )
+        for warning in st.session_state.source_profiles.pop_warnings():
+            st.warning(f"⚠️ {warning}")
+        return df
     except Exception as e:
         st.error(f"Error processing file: {str(e)}")
         return None
 
+def get_query_index():
+    """Return the query index over the non-transfer master transactions, rebuilding it only when the data changed"""
+    if st.session_state.transactions_df.empty:
+        return None
+    if st.session_state.get("query_index_source") is not st.session_state.transactions_df:
+        df = st.session_state.transactions_df
+        st.session_state.query_index = TransactionIndex(df, include=non_transfer_mask(df))
+        st.session_state.query_index_source = st.session_state.transactions_df
+    return st.session_state.query_index
+
+def get_trend_rollups():
+    """Return the pre-aggregated trend rollups, rebuilding them only when the master data changed"""
+    if st.session_state.transactions_df.empty:
+        return {}
+    if st.session_state.get("trend_rollups_source") is not st.session_state.transactions_df:
+        df = st.session_state.transactions_df
+        st.session_state.trend_rollups = build_rollups(df, include=non_transfer_mask(df))
+        st.session_state.trend_rollups_source = st.session_state.transactions_df
+    return st.session_state.trend_rollups
+
+def get_transfer_pairs():
+    """Return the flagged transfers as one row per pair, rebuilt only when the master data changed"""
+    df = st.session_state.transactions_df
+    if st.session_state.get("transfer_pairs_source") is not df:
+        flagged = df[df["Transfer"].fillna(False).astype(bool)] if "Transfer" in df.columns else df.iloc[:0]
+        pairs = match_transfers(flagged)
+        columns = [c for c in ["Date", "Source", "Merchant", "Description"] if c in flagged.columns]
+        outflows = flagged.loc[pairs["left"], columns].reset_index(drop=True)
+        inflows = flagged.loc[pairs["right"], columns].reset_index(drop=True)
+        st.session_state.transfer_pairs = pd.concat([
+            outflows.add_prefix("From "),
+            flagged.loc[pairs["left"], "Outflow"].reset_index(drop=True).rename("Amount"),
+            inflows.add_prefix("To "),
+        ], axis=1)
+        st.session_state.transfer_pairs_source = df
+    return st.session_state.transfer_pairs
+
+def get_subscriptions():
+    """Return detected recurring charges, running the full detection only the first time"""
+    if "subscriptions_df" not in st.session_state:
+        st.session_state.subscriptions_df = detect_recurring(st.session_state.transactions_df)
+    return st.session_state.subscriptions_df
+
+def get_master_totals():
+    """Return the running outflow totals for the master data, built once per session"""
+    if "master_totals" not in st.session_state:
+        st.session_state.master_totals = RunningTotals.from_frame(st.session_state.transactions_df)
+    return st.session_state.master_totals
+
+def get_session_totals():
+    """Return the running outflow totals for the current session data"""
+    if "session_totals" not in st.session_state:
+        session_df = st.session_state.get("current_session_df", pd.DataFrame())
+        st.session_state.session_totals = RunningTotals.from_frame(session_df)
+    return st.session_state.session_totals
+
+def commit_session_edit(updated_df, label):
+    """Store an edited session frame and record the edit in the session's history"""
+    if "edit_history" not in st.session_state:
+        st.session_state.edit_history = EditHistory(st.session_state.current_session_df)
+    st.session_state.edit_history.commit(updated_df, label)
+    st.session_state.current_session_df = st.session_state.edit_history.current
+
+def step_session_history(step):
+    """Undo or redo one edit, updating the budget running totals by the touched rows"""
+    history = st.session_state.edit_history
+    before_df = history.current
+    change = step()
+    rows = change.rows
+    get_session_totals().replace(
+        before_df.loc[before_df.index.intersection(rows)],
+        history.current.loc[history.current.index.intersection(rows)]
+    )
+    st.session_state.current_session_df = history.current
+    return change
+
+def show_edit_history():
+    """Undo/redo buttons, the list of versions and the diff of the selected edit"""
+    history = st.session_state.get("edit_history")
+    if history is None or st.session_state.current_session_df.empty:
+        return
+    with st.expander(f"🕘 Edit History (version {history.version})"):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            if st.button("↩️ Undo", disabled=not history.can_undo(), use_container_width=True):
+                change = step_session_history(history.undo)
+                st.toast(f"Undid: {change.label}")
+                st.rerun()
+        with col2:
+            if st.button("↪️ Redo", disabled=not history.can_redo(), use_container_width=True):
+                change = step_session_history(history.redo)
+                st.toast(f"Redid: {change.label}")
+                st.rerun()
+        with col3:
+            if st.button(
+                "⏮️ Undo All",
+                disabled=not history.can_undo(),
+                help=None if history.reaches_original() else f"Goes back to the oldest kept version - the {history.dropped} edits before it are no longer undoable",
+                use_container_width=True
+            ):
+                while history.can_undo():
+                    step_session_history(history.undo)
+                st.rerun()
+
+        entries = history.entries()
+        st.dataframe(
+            pd.DataFrame(
+                [(version, label, summary, "👉" if is_current else "") for version, label, summary, is_current in entries],
+                columns=["Version", "Edit", "Changes", "Current"]
+            ),
+            hide_index=True,
+            use_container_width=True
+        )
+        if len(entries) > 1:
+            version = st.selectbox(
+                "Show changes of version:",
+                [entry[0] for entry in entries[1:]],
+                index=max(history.version - 1, 0),
+                format_func=lambda v: f"{v} - {entries[v][1]}"
+            )
+            st.dataframe(history.change(version).diff(), hide_index=True, use_container_width=True)
+
+def get_category_model():
+    """Return the categorizer trained on the master data plus this session's pending corrections"""
+    if "category_model" not in st.session_state:
+        model = NaiveBayesCategorizer.from_frame(st.session_state.transactions_df)
+        model.learn(st.session_state.get("category_corrections"))
+        st.session_state.category_model = model
+    return st.session_state.category_model
+
+def learn_category_corrections(before_df, after_df):
+    """Learn the rows whose category was changed in an editor and return them.
+
+    They stay pending until the session is appended, when the master delta takes over.
+    """
+    if "Merchant" not in after_df.columns or "Category" not in after_df.columns:
+        return pd.DataFrame(columns=["Merchant", "Category"])
+    previous = before_df["Category"].reindex(after_df.index)
+    corrected = after_df.loc[after_df["Category"] != previous, ["Merchant", "Category"]]
+    if not corrected.empty:
+        get_category_model().learn(corrected)
+        pending = st.session_state.get("category_corrections")
+        st.session_state.category_corrections = corrected if pending is None else pd.concat([pending, corrected], ignore_index=True)
+    return corrected
+
+def clear_category_corrections():
+    """Forget the pending corrections - once appended they are learned as master rows"""
+    corrections = st.session_state.pop("category_corrections", None)
+    if corrections is not None and "category_model" in st.session_state:
+        st.session_state.category_model.forget(corrections)
+
+def show_budget_progress(month_spent):
+    """Show a progress bar for every category with a budget"""
+    status = budget_status(st.session_state.budgets, month_spent)
+    if not status:
+        st.info("No budgets set yet.")
+        return
+    for row in status:
+        label = f"{row['Category']}: ${row['Spent']:,.2f} of ${row['Budget']:,.2f}"
+        if row["Progress"] > 1:
+            label += f" ⚠️ over by ${-row['Remaining']:,.2f}"
+        st.progress(min(row["Progress"], 1.0), text=label)
+
+@st.cache_resource
+def get_job_runner():
+    """One background job runner shared by every session of this server"""
+    return JobRunner(max_workers=2)
+
+@st.fragment(run_every=2)
+def show_jobs():
+    """Show background job progress and results; refreshes on its own without rerunning the page"""
+    jobs = get_job_runner().jobs()[:5]
+    if not jobs:
+        return
+
+    st.subheader("⚙️ Background Jobs")
+    for job in jobs:
+        if job.active:
+            st.progress(job.progress, text=f"⏳ {job.label}: {job.message}")
+        elif job.status == "failed":
+            st.error(f"❌ {job.label} failed: {job.error}")
+        elif job.kind == "export":
+            st.success(f"✅ {job.label} finished")
+        else:
+            st.success(f"✅ {job.label}: {job.result['changed_rows']:,} row(s) updated in {job.result['partitions']} partition(s)")
+
+    # Results of the newest finished export
+    export_job = next((j for j in jobs if j.kind == "export" and j.status == "done"), None)
+    if export_job is not None:
+        st.subheader("Master Monthly Summary")
+        st.dataframe(
+            export_job.result["summary"],
+            column_config={
+                "Month": "Month",
+                "Outflow": st.column_config.NumberColumn("Outflow (CAD)", format="$%.2f"),
+                "Inflow": st.column_config.NumberColumn("Inflow (CAD)", format="$%.2f"),
+                "Net": st.column_config.NumberColumn("Net (CAD)", format="$%.2f")
+            },
+            use_container_width=True,
+            hide_index=True
+        )
+        st.download_button(
+            label="📥 Download Master Excel File",
+            data=export_job.result["data"],
+            file_name=master_excel_file,
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            key=f"download_{export_job.id}"
+        )
+
+    # Jobs that rewrote master data leave this session on an older snapshot
+    if PartitionedStore(transactions_dir).version != st.session_state.store_snapshot["version"]:
+        if st.button("🔄 Load Updated Data"):
+            st.rerun(scope="app")
+
 def add_keyword_to_category(category, keyword):
-    keyword = keyword.strip()
-    if keyword and keyword not in st.session_state.categories[category]:
-        st.session_state.categories[category].append(keyword)
-        save_categories()
-        return True
-    
-    return False        
+    keyword = normalize_merchant(keyword)
+    if not keyword or keyword in st.session_state.categories[category]:
+        return False
+    # Only merchants the learned model can't place yet need a keyword
+    if get_category_model().knows(keyword, category):
+        return False
+
+    def add(categories):
+        keywords = categories.setdefault(category, [])
+        if keyword not in keywords:
+            keywords.append(keyword)
+    update_categories(add)
+    return True
 
 def main():
     st.title("Simple Finance Dashboard")
@@ -272,7 +433,7 @@ def main():
     if st.session_state.data_loaded:
         st.info(f"📁 Loaded {len(st.session_state.transactions_df)} transactions from previous sessions")
     
-    uploaded_file = st.file_uploader("Upload your transaction CSV file", type=["csv"])
+    uploaded_file = st.file_uploader("Upload your transaction CSV or OFX/QFX file", type=["csv", "ofx", "qfx"])
 
     df = pd.DataFrame()  # Default empty DataFrame
 
@@ -286,14 +447,20 @@ def main():
         )
 
         if should_load:
+            # Corrections to the previous upload were never appended - drop them
+            clear_category_corrections()
             df = load_transactions(uploaded_file)
             if df is not None:
                 st.session_state.current_session_df = df.copy()
+                st.session_state.session_totals = RunningTotals.from_frame(df)
+                st.session_state.edit_history = EditHistory(st.session_state.current_session_df, label=f"Uploaded {uploaded_file.name}")
                 st.session_state.upload_token = upload_token
                 st.success(f"✅ Loaded {len(df)} transactions for this session")
 
+    show_edit_history()
+
     # Show tabs including new Master Tracker tab
-    tab1, tab2, tab3 = st.tabs(["💸 Outflow", "💰 Inflow", "📊 Master Tracker"])
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(["💸 Outflow", "💰 Inflow", "📊 Master Tracker", "🔎 Explore", "📈 Trends"])
 
     with tab1:
         st.subheader("💸 Outflow Transactions (Expenses)")
@@ -303,11 +470,81 @@ def main():
         
         if add_button and new_category:
             if new_category not in st.session_state.categories:
-                st.session_state.categories[new_category] = []
-                save_categories()
+                update_categories(lambda categories: categories.setdefault(new_category, []))
                 st.success(f"✅ Added category: {new_category}")
                 # Don't auto-rerun, let user click Apply Changes manually
 
+        with st.expander("🎯 Monthly Budgets"):
+            col_budget1, col_budget2, col_budget3 = st.columns([2, 2, 1])
+            with col_budget1:
+                budget_category = st.selectbox("Category", list(st.session_state.categories.keys()), key="budget_category")
+            with col_budget2:
+                budget_amount = st.number_input(
+                    "Monthly budget (CAD)",
+                    min_value=0.0,
+                    step=10.0,
+                    value=float(st.session_state.budgets.get(budget_category, 0.0)),
+                    key=f"budget_amount_{budget_category}"
+                )
+            with col_budget3:
+                st.write("")
+                if st.button("Set Budget", use_container_width=True):
+                    if budget_amount > 0:
+                        update_budgets(lambda budgets: budgets.update({budget_category: budget_amount}))
+                    else:
+                        update_budgets(lambda budgets: budgets.pop(budget_category, None))
+                    st.success(f"✅ Budget saved for {budget_category}")
+
+            # Spend-to-date is master data plus the not-yet-appended session, read from running totals
+            master_totals = get_master_totals()
+            session_totals = get_session_totals()
+            budget_months = sorted(master_totals.months() | session_totals.months() | {datetime.now().strftime("%Y-%m")}, reverse=True)
+            budget_month = st.selectbox("Month", budget_months, key="budget_month")
+            month_spent = master_totals.month(budget_month)
+            for category, spent in session_totals.month(budget_month).items():
+                month_spent[category] = month_spent.get(category, 0.0) + spent
+            show_budget_progress(month_spent)
+
+        with st.expander("🧩 Categorization Rules"):
+            st.caption(
+                "Rules beat the keyword lists, which beat the learned model. The highest priority wins, "
+                "empty conditions always match, and patterns are regular expressions. "
+                "New rules apply to the next upload - use Re-categorize All for the master data."
+            )
+            rules_df = pd.DataFrame(
+                st.session_state.rules,
+                columns=["name", "category", "priority", "merchant", "description", "min_amount", "max_amount", "source", "direction"]
+            )
+            edited_rules = st.data_editor(
+                rules_df,
+                column_config={
+                    "name": st.column_config.TextColumn("Name"),
+                    "category": st.column_config.SelectboxColumn("Category", options=list(st.session_state.categories.keys()), required=True),
+                    "priority": st.column_config.NumberColumn("Priority", step=1, default=0),
+                    "merchant": st.column_config.TextColumn("Merchant Pattern", help="Searched in the canonical merchant, e.g. ^UBER|LYFT"),
+                    "description": st.column_config.TextColumn("Description Pattern", help="Searched in the original description"),
+                    "min_amount": st.column_config.NumberColumn("Min Amount", format="%.2f CAD", min_value=0.0),
+                    "max_amount": st.column_config.NumberColumn("Max Amount", format="%.2f CAD", min_value=0.0),
+                    "source": st.column_config.TextColumn("Source", help="One source, or several separated by commas"),
+                    "direction": st.column_config.SelectboxColumn("Direction", options=["Inflow", "Outflow"]),
+                },
+                num_rows="dynamic",
+                hide_index=True,
+                use_container_width=True,
+                key="rules_editor"
+            )
+            if st.button("💾 Save Rules"):
+                rules = [clean_rule(row) for row in edited_rules.to_dict("records")]
+                rules = [rule for rule in rules if rule]
+                try:
+                    RuleEngine(rules)
+                except ValueError as e:
+                    st.error(f"❌ {e}")
+                else:
+                    st.session_state.rules = rules
+                    save_rules()
+                    st.success(f"✅ Saved {len(rules)} rule(s)")
+
         # Show current session data for editing
         # Use session state data if available, otherwise use current df
         display_df = st.session_state.current_session_df if hasattr(st.session_state, 'current_session_df') and not st.session_state.current_session_df.empty else df
@@ -338,11 +575,7 @@ def main():
                         if sort_by in outflow_df_sorted.columns:
                             outflow_df_sorted = outflow_df_sorted.sort_values(by=sort_by, ascending=ascending)
 
-                    # Only use columns that exist
-                    if "Date" in outflow_df_sorted.columns:
-                        outflow_df_sorted["Date"] = pd.to_datetime(outflow_df_sorted["Date"], errors="coerce")
-                    
-                    display_cols = [col for col in ["Date", "Description", "Merchant", "Outflow", "Category"] if col in outflow_df_sorted.columns]
+                    display_cols = [col for col in ["Date", "Description", "Merchant", "Outflow", "Category", "Rule"] if col in outflow_df_sorted.columns]
                 else:
                     st.info("No outflow transactions found in current session data.")
                     display_cols = []
@@ -364,11 +597,7 @@ def main():
                     if sort_by in df_sorted.columns:
                         df_sorted = df_sorted.sort_values(by=sort_by, ascending=ascending)
 
-                # Only use columns that exist
-                if "Date" in df_sorted.columns:
-                    df_sorted["Date"] = pd.to_datetime(df_sorted["Date"], errors="coerce")
-                
-                display_cols = [col for col in ["Date", "Description", "Merchant", "Amount", "Category"] if col in df_sorted.columns]
+                display_cols = [col for col in ["Date", "Description", "Merchant", "Amount", "Category", "Rule"] if col in df_sorted.columns]
                 outflow_df_sorted = df_sorted
 
             if display_cols:  # Only show editor if there are transactions
@@ -376,9 +605,9 @@ def main():
                 outflow_df_sorted["Delete"] = False
                 display_cols.append("Delete")
 
-                # Ensure Date column is datetime for editing
+                # Ensure Date column is datetime for editing (a no-op once the upload has been parsed)
                 if "Date" in outflow_df_sorted.columns:
-                    outflow_df_sorted["Date"] = pd.to_datetime(outflow_df_sorted["Date"], errors="coerce")
+                    outflow_df_sorted["Date"] = parse_dates(outflow_df_sorted["Date"])
 
                 # Excel-like editing with better column configuration
                 column_config = {
@@ -395,6 +624,11 @@ def main():
                         options=list(st.session_state.categories.keys()),
                         help="Click to change category"
                     ),
+                    "Rule": st.column_config.TextColumn(
+                        "Rule",
+                        help="Which rule set the category",
+                        disabled=True
+                    ),
                     "Delete": st.column_config.CheckboxColumn(
                         "Delete",
                         help="Check to delete this transaction"
@@ -442,7 +676,19 @@ def main():
                     save_button = st.button("💾 Apply Changes", type="primary", use_container_width=True)
                 
                 with col2:
-                    if st.button("🔄 Reset to Original", use_container_width=True):
+                    history = st.session_state.get("edit_history")
+                    # Once the oldest edits fall out of the history the upload can't be restored
+                    original_lost = history is not None and not history.reaches_original()
+                    if st.button(
+                        "🔄 Reset to Original",
+                        disabled=original_lost,
+                        help="Older edits have left the edit history - use Undo All to go back as far as it reaches" if original_lost else None,
+                        use_container_width=True
+                    ):
+                        # Back to the uploaded version; the edits stay available through Redo
+                        if history is not None:
+                            while history.can_undo():
+                                step_session_history(history.undo)
                         st.rerun()
                 
                 with col3:
@@ -466,27 +712,27 @@ def main():
                             if col in keep_df.columns:
                                 keep_df[col] = pd.to_numeric(keep_df[col], errors="coerce").fillna(0.0)
 
-                        # 4) (Optional) add changed merchants into category keyword lists
-                        #    Here we simply go row-by-row and ensure any (Merchant, Category) pairs are learned.
-                        if "Merchant" in keep_df.columns and "Category" in keep_df.columns:
-                            for _, row in keep_df.iterrows():
-                                merchant = str(row.get("Merchant", "")).strip()
-                                cat = row.get("Category", "Uncategorized")
-                                if merchant and cat in st.session_state.categories:
-                                    add_keyword_to_category(cat, merchant)
-
-                        # 5) Rebuild the full current_session_df:
-                        source_df = st.session_state.current_session_df.copy()
-                        if "Inflow" in source_df.columns and "Outflow" in source_df.columns:
-                            df_without_outflow = source_df[source_df["Outflow"] <= 0].copy()
-                            updated_df = pd.concat([df_without_outflow, keep_df], ignore_index=True)
+                        # 4) Learn the changed categories; merchants the model can't place yet also get a keyword
+                        corrected = learn_category_corrections(outflow_df_sorted, keep_df)
+                        if "Rule" in keep_df.columns:
+                            keep_df.loc[corrected.index, "Rule"] = MANUAL_RULE
+                        for merchant, cat in corrected.drop_duplicates().itertuples(index=False):
+                            merchant = str(merchant).strip()
+                            if merchant and cat in st.session_state.categories:
+                                add_keyword_to_category(cat, merchant)
 
-                        else:
-                            # Legacy format: keep_df already represents the edited set
-                            updated_df = keep_df.copy()
+                        # 5) Rebuild the full current_session_df: the editor keeps the row index, so drop the
+                        #    deleted rows and write the edited cells back in place (other columns stay as they were)
+                        source_df = st.session_state.current_session_df
+                        previous_outflow_df = source_df.loc[edited_df_clean.index]
+                        updated_df = source_df.drop(index=edited_df_clean.index[to_delete_mask])
+                        updated_df.loc[keep_df.index, keep_df.columns] = keep_df
+
+                        # Budget running totals: swap the old outflow rows for the edited ones
+                        get_session_totals().replace(previous_outflow_df, updated_df.loc[keep_df.index])
 
-                        # 6) Store back to session
-                        st.session_state.current_session_df = updated_df
+                        # 6) Store back to session, recording the edit in the history
+                        commit_session_edit(updated_df, "Outflow changes")
 
                         # 7) User feedback
                         deleted_count = int(to_delete_mask.sum())
@@ -506,6 +752,8 @@ def main():
                             st.balloons()
                             # Clear current session data
                             st.session_state.current_session_df = pd.DataFrame()
+                            st.session_state.session_totals = RunningTotals()
+                            st.session_state.pop("edit_history", None)
                             st.rerun()
                         else:
                             st.error("❌ Failed to append data.")
@@ -611,15 +859,15 @@ def main():
                     st.metric("Total Inflow", f"${total_inflow:,.2f}")
                     
                     # Display inflow transactions
-                    display_cols = [col for col in ["Date", "Description", "Merchant", "Inflow", "Category"] if col in inflow_df.columns]
+                    display_cols = [col for col in ["Date", "Description", "Merchant", "Inflow", "Category", "Rule"] if col in inflow_df.columns]
                     
                     # Add delete column
                     inflow_df["Delete"] = False
                     display_cols.append("Delete")
                     
-                    # Ensure Date column is datetime for editing
+                    # Ensure Date column is datetime for editing (a no-op once the upload has been parsed)
                     if "Date" in inflow_df.columns:
-                        inflow_df["Date"] = pd.to_datetime(inflow_df["Date"], errors="coerce")
+                        inflow_df["Date"] = parse_dates(inflow_df["Date"])
 
                     # Excel-like editing for inflow
                     column_config = {
@@ -627,6 +875,7 @@ def main():
                         "Merchant": st.column_config.TextColumn("Merchant"),
                         "Inflow": st.column_config.NumberColumn("Inflow", format="%.2f CAD", min_value=0.0, step=0.01),
                         "Category": st.column_config.SelectboxColumn("Category", options=list(st.session_state.categories.keys())),
+                        "Rule": st.column_config.TextColumn("Rule", help="Which rule set the category", disabled=True),
                         "Delete": st.column_config.CheckboxColumn("Delete")
                     }
                     
@@ -647,6 +896,9 @@ def main():
                     with col1:
                         if st.button("💾 Save Inflow Changes", type="primary"):
                             try:
+                                # Learn the changed categories before the keyword check below
+                                learn_category_corrections(inflow_df, edited_inflow_df[edited_inflow_df["Delete"] != True])
+
                                 # Simple approach: Create new dataframe with only non-deleted rows
                                 rows_to_keep = []
                                 
@@ -669,12 +921,15 @@ def main():
                                             new_category = row.get("Category", old_category)
                                             if merchant and new_category != old_category:
                                                 add_keyword_to_category(new_category, merchant)
+                                            if new_category != old_category:
+                                                original_row["Rule"] = MANUAL_RULE
                                             
                                             rows_to_keep.append(original_row)
                                 
                                 # Create new dataframe with only the rows we want to keep
                                 if rows_to_keep:
-                                    new_inflow_df = pd.DataFrame(rows_to_keep).reset_index(drop=True)
+                                    # Rows keep their index label so the edit history can match them up
+                                    new_inflow_df = pd.DataFrame(rows_to_keep).drop(columns=["Delete"]).infer_objects()
                                     
                                     # Count how many were deleted
                                     deleted_count = len(inflow_df) - len(rows_to_keep)
@@ -683,10 +938,10 @@ def main():
                                     # Remove all inflow transactions first
                                     df_without_inflow = display_df_inflow[display_df_inflow["Inflow"] <= 0].copy()
                                     # Add back the updated inflow transactions
-                                    updated_df_inflow = pd.concat([df_without_inflow, new_inflow_df], ignore_index=True)
+                                    updated_df_inflow = pd.concat([df_without_inflow, new_inflow_df])
                                     
-                                    # Update session state
-                                    st.session_state.current_session_df = updated_df_inflow.copy()
+                                    # Update session state, recording the edit in the history
+                                    commit_session_edit(updated_df_inflow, "Inflow changes")
                                     
                                     if deleted_count > 0:
                                         st.success(f"✅ Deleted {deleted_count} inflow transaction(s)")
@@ -729,40 +984,27 @@ def main():
             current_date = datetime.now()
             current_month = current_date.strftime("%Y-%m")
             
-            df_master = st.session_state.transactions_df.copy()
-            if "Date" in df_master.columns:
-                df_master["Date"] = pd.to_datetime(df_master["Date"], errors="coerce")
-                df_master["Month"] = df_master["Date"].dt.to_period('M').astype(str)
-            else:
-                df_master["Month"] = current_month
-            
-            # Calculate totals for all months using separate Inflow/Outflow columns
-            if "Inflow" in df_master.columns and "Outflow" in df_master.columns:
-                all_outflow = df_master["Outflow"].sum()
-                all_inflow = df_master["Inflow"].sum()
-                all_net = all_inflow - all_outflow
-                
-                # Calculate current month totals
-                current_month_data = df_master[df_master["Month"] == current_month]
-                current_outflow = current_month_data["Outflow"].sum()
-                current_inflow = current_month_data["Inflow"].sum()
-                current_net = current_inflow - current_outflow
-            else:
-                # Fallback for legacy Amount column
-                all_outflow = df_master["Amount"].abs().sum()
-                all_inflow = 0
-                all_net = all_inflow - all_outflow
-                
-                current_month_data = df_master[df_master["Month"] == current_month]
-                current_outflow = current_month_data["Amount"].abs().sum()
-                current_inflow = 0
-                current_net = current_inflow - current_outflow
+            # Totals come from the partition catalog - the current month only reads its own partitions.
+            # Transfers between accounts are neither inflow nor outflow and are left out of the totals.
+            all_totals = store.totals()
+            current_totals = store.totals(months=[current_month])
+            transfer_count = all_totals["transfers"]
+
+            all_outflow = all_totals["outflow"]
+            all_inflow = all_totals["inflow"]
+            all_net = all_totals["net"]
+
+            current_outflow = current_totals["outflow"]
+            current_inflow = current_totals["inflow"]
+            current_net = current_totals["net"]
             
             # Display summary
             col1, col2, col3, col4 = st.columns(4)
             with col1:
                 st.metric("Current Month", current_month)
-                st.caption(f"All-time: {len(df_master)} transactions")
+                st.caption(f"All-time: {all_totals['rows'] - transfer_count} transactions")
+                if transfer_count > 0:
+                    st.caption(f"{transfer_count} transfer transactions excluded")
             with col2:
                 st.metric("Outflow (Current)", f"${current_outflow:,.2f}")
                 st.caption(f"All-time: ${all_outflow:,.2f}")
@@ -772,37 +1014,211 @@ def main():
             with col4:
                 st.metric("Net (Current)", f"${current_net:,.2f}", delta=f"{current_net:+,.2f}")
                 st.caption(f"All-time: ${all_net:,.2f}")
-            
-            # Create and download Excel file
-            if st.button("📥 Export Master Excel File", type="primary"):
-                with st.spinner("Creating master Excel file..."):
-                    master_df = create_master_excel()
-                    
-                    # Display the master summary
-                    st.subheader("Master Monthly Summary")
+
+            # Show what was left out, so a wrong match can be spotted
+            if transfer_count > 0:
+                with st.expander(f"🔁 Transfers excluded from totals ({transfer_count} transactions)"):
                     st.dataframe(
-                        master_df,
+                        get_transfer_pairs(),
                         column_config={
-                            "Month": "Month",
-                            "Outflow": st.column_config.NumberColumn("Outflow (CAD)", format="$%.2f"),
-                            "Inflow": st.column_config.NumberColumn("Inflow (CAD)", format="$%.2f"),
-                            "Net": st.column_config.NumberColumn("Net (CAD)", format="$%.2f")
+                            "From Date": st.column_config.DateColumn("From Date", format="DD/MM/YYYY"),
+                            "To Date": st.column_config.DateColumn("To Date", format="DD/MM/YYYY"),
+                            "Amount": st.column_config.NumberColumn("Amount", format="%.2f CAD"),
                         },
-                        use_container_width=True,
-                        hide_index=True
+                        hide_index=True,
+                        use_container_width=True
                     )
-                    
-                    # Provide download link
-                    if os.path.exists(master_excel_file):
-                        with open(master_excel_file, "rb") as file:
-                            st.download_button(
-                                label="📥 Download Master Excel File",
-                                data=file.read(),
-                                file_name=master_excel_file,
-                                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                            )
-                        st.success("✅ Master Excel file created successfully!")
+                    st.caption("Only pairs with payment or transfer wording (or an OFX transfer type) on one side count as transfers.")
+            
+            # Exports and full-history passes run in the shared background job runner,
+            # so the page stays responsive and a rerun doesn't lose the work
+            runner = get_job_runner()
+            col_job1, col_job2, col_job3 = st.columns(3)
+            with col_job1:
+                if st.button("📥 Export Master Excel File", type="primary", use_container_width=True):
+                    runner.submit(
+                        "export", export_master_excel, transactions_dir, master_excel_file,
+                        key=f"export:{store.version}", label="Export master Excel file"
+                    )
+            with col_job2:
+                if st.button("🏷️ Re-categorize All Transactions", use_container_width=True):
+                    categories = {category: list(keywords) for category, keywords in st.session_state.categories.items()}
+                    rules = list(st.session_state.rules)
+                    override_manual = st.session_state.get("override_manual", False)
+                    runner.submit(
+                        "recategorize", recategorize_all, transactions_dir, categories,
+                        rules=rules, override_manual=override_manual,
+                        key=f"recategorize:{store.version}:{override_manual}:{json.dumps([categories, rules], sort_keys=True)}",
+                        label="Re-categorize all transactions"
+                    )
+                st.checkbox("Also override manual edits", key="override_manual",
+                            help="By default transactions whose category was changed by hand keep it")
+            with col_job3:
+                if st.button("🧹 Backfill Merchants & Transfers", use_container_width=True):
+                    runner.submit(
+                        "backfill", backfill_master, transactions_dir,
+                        key=f"backfill:{store.version}", label="Backfill merchants and transfers"
+                    )
+            show_jobs()
+
+            # Budget progress for the current month from the running totals
+            st.subheader("🎯 Budgets This Month")
+            show_budget_progress(get_master_totals().month(current_month))
+
+            # Recurring charges found in the master data
+            st.subheader("🔁 Subscriptions")
+            subscriptions_df = get_subscriptions()
+            if not subscriptions_df.empty:
+                active_subscriptions = subscriptions_df[subscriptions_df["Active"]]
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.metric("Active Subscriptions", len(active_subscriptions))
+                with col2:
+                    st.metric("Monthly Cost", f"${active_subscriptions['Monthly Cost'].sum():,.2f}")
+
+                show_inactive = st.checkbox("Show inactive subscriptions", key="show_inactive_subscriptions")
+                st.dataframe(
+                    subscriptions_df if show_inactive else active_subscriptions,
+                    column_config={
+                        "Amount": st.column_config.NumberColumn("Amount", format="%.2f CAD"),
+                        "Monthly Cost": st.column_config.NumberColumn("Monthly Cost", format="%.2f CAD"),
+                        "First Charge": st.column_config.DateColumn("First Charge", format="DD/MM/YYYY"),
+                        "Last Charge": st.column_config.DateColumn("Last Charge", format="DD/MM/YYYY"),
+                        "Next Charge": st.column_config.DateColumn("Next Charge", format="DD/MM/YYYY"),
+                        "Active": st.column_config.CheckboxColumn("Active")
+                    },
+                    use_container_width=True,
+                    hide_index=True
+                )
+            else:
+                st.info("No recurring charges found yet.")
         else:
             st.info("Upload transaction data and append to master database to see your finance tracker.")
 
+    with tab4:
+        st.subheader("🔎 Explore Master Data")
+        st.write("Filter and group all saved transactions. Transfers between your accounts are left out.")
+
+        index = get_query_index()
+        if index is not None:
+            # Filter controls
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                date_range = st.date_input("Date range", value=(), key="explore_dates")
+            with col2:
+                explore_categories = st.multiselect("Category", index.values("Category"), key="explore_categories")
+            with col3:
+                explore_sources = st.multiselect("Source", index.values("Source"), key="explore_sources")
+
+            col4, col5 = st.columns(2)
+            with col4:
+                explore_merchant = st.text_input("Merchant (canonical name)", key="explore_merchant")
+            with col5:
+                group_by = st.selectbox("Group by:", ["None", "Month", "Week", "Year", "Category", "Source", "Merchant"], key="explore_group_by")
+
+            # Build the query from the selected filters
+            query = index.query()
+            if len(date_range) == 2:
+                query = query.between(date_range[0], date_range[1])
+            elif len(date_range) == 1:
+                query = query.between(date_range[0], date_range[0])
+            if explore_categories:
+                query = query.where(Category=explore_categories)
+            if explore_sources:
+                query = query.where(Source=explore_sources)
+            if explore_merchant.strip():
+                query = query.where(Merchant=explore_merchant)
+
+            start_time = time.perf_counter()
+            if group_by == "None":
+                result_df = query.rows()
+            else:
+                result_df = query.group_by(group_by)
+            elapsed_ms = (time.perf_counter() - start_time) * 1000
+
+            # Display results
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Transactions", f"{query.count():,}")
+            with col2:
+                st.metric("Outflow", f"${query.total('Outflow'):,.2f}")
+            with col3:
+                st.metric("Inflow", f"${query.total('Inflow'):,.2f}")
+            st.caption(f"Query answered in {elapsed_ms:.2f} ms from {len(index):,} indexed transactions")
+
+            st.dataframe(
+                result_df,
+                column_config={
+                    "Outflow": st.column_config.NumberColumn("Outflow", format="%.2f CAD"),
+                    "Inflow": st.column_config.NumberColumn("Inflow", format="%.2f CAD"),
+                    "Amount": st.column_config.NumberColumn("Amount", format="%.2f CAD")
+                },
+                use_container_width=True,
+                hide_index=True
+            )
+        else:
+            st.info("Append transactions to the master database to explore them here.")
+
+    with tab5:
+        st.subheader("📈 Spending Trends")
+        st.write("Spend and net flow over time, per category.")
+
+        rollups = get_trend_rollups()
+        if rollups:
+            daily = rollups["Daily"]
+            first_day = daily["Period"].min().date()
+            last_day = daily["Period"].max().date()
+
+            # Zoom: the selected date span decides the granularity when set to Auto
+            if first_day < last_day:
+                zoom_start, zoom_end = st.slider(
+                    "Date range",
+                    min_value=first_day,
+                    max_value=last_day,
+                    value=(first_day, last_day),
+                    format="YYYY-MM-DD",
+                    key="trend_zoom"
+                )
+            else:
+                zoom_start, zoom_end = first_day, last_day
+
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                trend_metric = st.selectbox("Show:", ["Outflow", "Inflow", "Net"], key="trend_metric")
+            with col2:
+                trend_granularity = st.selectbox("Granularity:", ["Auto", "Daily", "Weekly", "Monthly"], key="trend_granularity")
+            with col3:
+                split_by_category = st.checkbox("Split by category", value=True, key="trend_split")
+
+            trend_categories = st.multiselect(
+                "Categories",
+                sorted(daily["Category"].unique()),
+                key="trend_categories"
+            )
+
+            granularity, series = trend_series(
+                rollups,
+                zoom_start,
+                zoom_end,
+                granularity=trend_granularity,
+                categories=trend_categories,
+                by_category=split_by_category
+            )
+
+            if not series.empty:
+                fig = px.line(
+                    series,
+                    x="Period",
+                    y=trend_metric,
+                    color="Category" if split_by_category else None,
+                    markers=len(series) < 60,
+                    title=f"{granularity} {trend_metric}"
+                )
+                st.plotly_chart(fig, use_container_width=True)
+                st.caption(f"{granularity} view, {len(series):,} points plotted")
+            else:
+                st.info("No transactions in the selected range.")
+        else:
+            st.info("Append transactions to the master database to see trends.")
+
 main()   
\ No newline at end of file
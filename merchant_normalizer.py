@@ -0,0 +1,122 @@
+import re
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+# === NORMALIZATION RULES ===
+# Applied in order to the upper-cased description. Each rule is (name, compiled pattern, replacement).
+
+PROVINCES = r"(?:AB|BC|MB|NB|NL|NS|NT|NU|ON|PE|QC|SK|YT|CA|CAN|US|USA)"
+POSTAL_CODE = r"(?:\s+[A-Z]\d[A-Z]\s?\d[A-Z]\d)"
+# Cities that show up in front of a province code; a province code after any other word is
+# left alone, since it may be part of the name ("TOYS R US", "CARRY ON")
+CITIES = (
+    r"(?:TORONTO|NORTH YORK|SCARBOROUGH|ETOBICOKE|MISSISSAUGA|BRAMPTON|OAKVILLE|BURLINGTON|HAMILTON|"
+    r"MARKHAM|VAUGHAN|RICHMOND HILL|OSHAWA|OTTAWA|KITCHENER|WATERLOO|LONDON|WINDSOR|GUELPH|BARRIE|"
+    r"MONTREAL|LAVAL|QUEBEC|GATINEAU|VANCOUVER|BURNABY|SURREY|RICHMOND|VICTORIA|CALGARY|EDMONTON|"
+    r"WINNIPEG|REGINA|SASKATOON|HALIFAX|MONCTON|FREDERICTON|ST JOHN'?S|CHARLOTTETOWN|WHITEHORSE|"
+    r"YELLOWKNIFE|IQALUIT)"
+)
+
+_rules = [
+    # Bank transaction-type wrappers, e.g. "Point of Sale - Interac RETAIL PURCHASE 000123456789 ..."
+    ("bank_wrapper", re.compile(
+        r"^(?:POINT OF SALE\s*-\s*)?(?:INTERAC\s+|VISA DEBIT\s+)?(?:RETAIL PURCHASE|PURCHASE|PREAUTHORIZED DEBIT|"
+        r"INTERNET BILL PAY|INTERNET BANKING|ELECTRONIC FUNDS TRANSFER|E-TRANSFER)\s*(?:-\s*)?(?:\d{6,}\s+)?"
+    ), ""),
+    # Payment processor prefixes: "SQ *", "TST* ", "PAYPAL *", "SP ", "IC* " ...
+    ("processor_prefix", re.compile(r"^(?:SQ|TST|PAYPAL|PP|SP|IC|DD|WPY|CKO|ZTL|GOOGLE|APPLE\.COM/BILL)\s?[*\-]\s*"), ""),
+    # Reference codes after an asterisk, e.g. "AMAZON.CA*AB12CD3E4" or "UBER* TRIP 1AB2C"
+    ("reference_suffix", re.compile(r"\*\s*[A-Z0-9]*\d[A-Z0-9]*\b.*$"), ""),
+    # Locations in a padded column: "TIM HORTONS      TORONTO" - runs before any rule that
+    # replaces text with spaces, which could otherwise form a run that looks like a column
+    ("padded_location", re.compile(r"(?<=\S)\s{3,}.*$"), ""),
+    # Dates embedded in descriptions: 2025-01-31, 31/01/25, 01-31, JAN 31
+    ("date", re.compile(
+        r"\b(?:\d{4}-\d{2}-\d{2}|\d{1,2}[/-]\d{1,2}(?:[/-]\d{2,4})?|"
+        r"(?:JAN|FEB|MAR|APR|MAY|JUN|JUL|AUG|SEP|OCT|NOV|DEC)\s\d{1,2})\b"
+    ), " "),
+    # Store numbers and everything after them (usually the location): "#1234 TORONTO ON", "STORE 0042"
+    ("store_number", re.compile(r"\s*(?:#\s*\d+|\bNO\.?\s*\d+|\bSTORE\s+\d+|\bSTR\s+\d+)\b.*$"), ""),
+    # Trailing province code, only where it can't be part of the name: after a comma
+    # ("..., TORONTO, ON"), a known city ("TORONTO ON"), a number ("866-579-7172 CA") or before
+    # a postal code ("ON K2B 8J9")
+    ("province_suffix", re.compile(
+        r"(?:(?:,\s*[A-Z .'-]+)?,\s*|\s+" + CITIES + r",?\s+|(?<=\d)\s+)" + PROVINCES + POSTAL_CODE + r"?$|"
+        r"\s+" + PROVINCES + POSTAL_CODE + r"$"
+    ), ""),
+    # Phone numbers and long digit runs after the name (terminal, invoice or card numbers)
+    ("digits", re.compile(r"(?<=\s)(?:\d[\d-]{4,}\d|\d{3,})\b"), " "),
+    # Mixed letter/digit reference tokens, e.g. "UBER TRIP 1AB2C"
+    ("reference_token", re.compile(r"\s+(?=[A-Z]*\d)(?=\d*[A-Z])[A-Z0-9]{5,}\b"), " "),
+    # Domain suffixes: "NETFLIX.COM" -> "NETFLIX"
+    ("domain", re.compile(r"\.(?:COM|CA|NET|ORG|IO)\b(?:/\S*)?"), ""),
+    # Leftover punctuation and whitespace
+    ("punctuation", re.compile(r"[^\w&' ]+"), " "),
+    ("whitespace", re.compile(r"\s+"), " "),
+]
+
+# Older AMEX exports used this instead of a merchant name
+AMEX_PLACEHOLDER = "AMEX Transaction"
+
+# Well-known aliases that the rules above cannot collapse on their own
+ALIASES = {
+    "AMZN": "AMAZON",
+    "AMZN MKTP": "AMAZON",
+    "AMAZON MKTPLACE": "AMAZON",
+    "AMAZON MARKETPLACE": "AMAZON",
+    "TIM HORTON'S": "TIM HORTONS",
+    "MCDONALD'S": "MCDONALDS",
+}
+
+
+@lru_cache(maxsize=65536)
+def normalize_merchant(value):
+    """Return the canonical merchant for a raw description, e.g. 'TIM HORTONS #1234 TORONTO ON' -> 'TIM HORTONS'.
+
+    Results are memoized, so repeated descriptions cost a dictionary lookup.
+    """
+    if not isinstance(value, str):
+        if value is None or pd.isna(value):
+            return ""
+        value = str(value)
+
+    original = value.strip().upper()
+    text = original
+    for _, pattern, replacement in _rules:
+        text = pattern.sub(replacement, text)
+    text = text.strip(" '&")
+
+    # Never normalize a description away completely
+    if not text:
+        text = _rules[-1][1].sub(" ", original).strip()
+    return ALIASES.get(text, text)
+
+
+def normalize_merchants(values):
+    """Normalize a Series of merchants/descriptions, running the rules once per distinct value"""
+    values = pd.Series(values)
+    codes, uniques = pd.factorize(values, sort=False)
+    # Missing values get code -1, which picks the trailing "" entry
+    canonical = np.array([normalize_merchant(v) for v in uniques] + [""], dtype=object)
+    return pd.Series(canonical[codes], index=values.index, dtype=object)
+
+
+def canonical_keywords(keywords):
+    """Collapse category keywords to canonical merchants, keeping order and dropping duplicates"""
+    return list(dict.fromkeys(k for k in (normalize_merchant(k) for k in keywords) if k))
+
+
+def canonical_merchant_column(df):
+    """Canonical merchants for a frame, from Merchant with Description as the fallback.
+
+    Returns None if the frame has neither column.
+    """
+    if "Merchant" in df.columns:
+        raw_merchants = df["Merchant"]
+        if "Description" in df.columns:
+            raw_merchants = raw_merchants.where(raw_merchants != AMEX_PLACEHOLDER, df["Description"])
+        return normalize_merchants(raw_merchants)
+    if "Description" in df.columns:
+        return normalize_merchants(df["Description"])
+    return None
@@ -0,0 +1,88 @@
+import os
+import time
+from watchdog.observers import Observer
+from watchdog.events import FileSystemEventHandler
+from ofx_importer import OFX_COLUMNS, is_ofx, iter_ofx_frames
+from storage import atomic_write
+
+# === CONFIGURATION ===
+WATCH_FOLDER = r"C:\Users\SalihAl-Tak\OneDrive - adam-tools.com\Desktop\Bank_statements\OFX"
+OUTPUT_FOLDER = r"C:\Users\SalihAl-Tak\OneDrive - adam-tools.com\Desktop\Bank_statements\PROCESSED"
+SOURCE = None  # None uses the bank name (ORG) from each file, e.g. "TD" or "RBC"
+processed_files = {}
+
+# === CLEANING FUNCTION ===
+def clean_ofx(file_path):
+    print(f"🔧 Processing OFX: {file_path}")
+    count = 0
+
+    def write(path):
+        # Streamed a chunk at a time, so large downloads never sit in memory as a whole
+        nonlocal count
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            f.write(",".join(OFX_COLUMNS) + "\n")
+            for chunk in iter_ofx_frames(file_path, SOURCE):
+                chunk.to_csv(f, index=False, header=False, columns=OFX_COLUMNS, date_format="%Y-%m-%d")
+                count += len(chunk)
+
+    # Save cleaned CSV - written atomically so the dashboard never picks up a half-written file
+    base_name = os.path.splitext(os.path.basename(file_path))[0]
+    output_path = os.path.join(OUTPUT_FOLDER, f"{base_name}_ofx_cleaned.csv")
+    atomic_write(output_path, write)
+
+    print(f"✅ Cleaned OFX saved to: {output_path}")
+    print(f"📊 Processed {count} transactions")
+
+
+# === FILE WATCHER ===
+class OFXWatcher(FileSystemEventHandler):
+    def on_created(self, event):
+        self.process(event)
+
+    def on_modified(self, event):
+        self.process(event)
+
+    def process(self, event):
+        if event.is_directory or not is_ofx(event.src_path):
+            return
+
+        path = event.src_path
+        now = time.time()
+
+        # Debounce: skip if processed in the last 10 seconds
+        if path in processed_files and now - processed_files[path] < 10:
+            return
+
+        processed_files[path] = now
+
+        # Try multiple times in case file is locked
+        for attempt in range(5):
+            try:
+                clean_ofx(path)
+                break
+            except PermissionError:
+                print(f"[WAIT] File locked, retrying... ({attempt + 1}/5)")
+                time.sleep(1)
+            except Exception as e:
+                print(f"❌ Error processing {path}: {e}")
+                break
+
+
+# === MAIN LOOP ===
+def start_watching():
+    if not os.path.exists(OUTPUT_FOLDER):
+        os.makedirs(OUTPUT_FOLDER)
+
+    print(f"👀 Watching: {WATCH_FOLDER}")
+    observer = Observer()
+    observer.schedule(OFXWatcher(), path=WATCH_FOLDER, recursive=False)
+    observer.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        observer.stop()
+    observer.join()
+
+if __name__ == "__main__":
+    start_watching()
@@ -0,0 +1,220 @@
+import json
+import os
+import re
+import time
+import uuid
+import pandas as pd
+from storage import FileLock, atomic_write, atomic_write_json
+from transaction_matching import exclude_transfers
+
+CATALOG_FILE = "catalog.json"
+LOCK_FILE = "catalog.lock"
+UNKNOWN_SOURCE = "UNKNOWN"
+UNDATED_MONTH = "undated"
+SNAPSHOT_RETENTION_SECONDS = 300  # superseded partition files stay readable this long
+
+
+def _source_key(value):
+    """Turn a Source value into a safe directory name"""
+    text = str(value).strip() if isinstance(value, str) or pd.notna(value) else ""
+    return re.sub(r"[^A-Za-z0-9_-]", "_", text) or UNKNOWN_SOURCE
+
+
+def _totals(df):
+    """Row count, transfer count and non-transfer Inflow/Outflow totals for one partition"""
+    counted = exclude_transfers(df)
+    if "Inflow" in df.columns and "Outflow" in df.columns:
+        inflow = pd.to_numeric(counted["Inflow"], errors="coerce").fillna(0.0).sum()
+        outflow = pd.to_numeric(counted["Outflow"], errors="coerce").fillna(0.0).sum()
+    elif "Amount" in df.columns:
+        # Legacy format - treat all amounts as outflows
+        inflow = 0.0
+        outflow = pd.to_numeric(counted["Amount"], errors="coerce").fillna(0.0).abs().sum()
+    else:
+        inflow = outflow = 0.0
+    return {
+        "rows": int(len(df)),
+        "transfers": int(len(df) - len(counted)),
+        "inflow": round(float(inflow), 2),
+        "outflow": round(float(outflow), 2),
+    }
+
+
+class StoreConflict(Exception):
+    """Raised when a write is based on a snapshot whose partitions were changed by another writer"""
+
+    def __init__(self, partitions):
+        super().__init__(f"Partitions changed by another writer: {', '.join(sorted(partitions))}")
+        self.partitions = partitions
+
+
+class PartitionedStore:
+    """Master transactions stored as immutable JSON files per (Source, month) behind a versioned catalog.
+
+    Layout:
+        <root>/<SOURCE>/<YYYY-MM>.<id>.json   one version of the transactions of one account in one month
+        <root>/catalog.json                   current version number and, per partition, its file,
+                                              row count and Inflow/Outflow totals
+
+    Readers load the catalog once (a snapshot) and read the files it names. Those files are
+    never modified, and the catalog is replaced atomically, so readers never take a lock and
+    never see a partial write. Writers write new partition files first, then take the
+    inter-process lock only to check for conflicts and swap in the new catalog, so appends to
+    different partitions don't wait on each other's file writes.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.snapshot = self._load_catalog()
+
+    @property
+    def catalog(self):
+        return self.snapshot["partitions"]
+
+    @property
+    def version(self):
+        return self.snapshot["version"]
+
+    # === CATALOG ===
+    def _catalog_path(self):
+        return os.path.join(self.root, CATALOG_FILE)
+
+    def _load_catalog(self):
+        if not os.path.exists(self._catalog_path()):
+            return {"version": 0, "partitions": {}}
+        with open(self._catalog_path(), "r") as f:
+            return json.load(f)
+
+    def refresh(self):
+        """Load the latest catalog snapshot"""
+        self.snapshot = self._load_catalog()
+        return self.snapshot
+
+    def _partition_path(self, entry):
+        return os.path.join(self.root, *entry["file"].split("/"))
+
+    def partition_keys(self, df):
+        """Return the "<SOURCE>/<YYYY-MM>" partition key of every row"""
+        if df.empty:
+            return pd.Series([], index=df.index, dtype=object)
+        if "Source" in df.columns:
+            sources = df["Source"].map(_source_key)
+        else:
+            sources = pd.Series(UNKNOWN_SOURCE, index=df.index)
+        if "Date" in df.columns:
+            months = pd.to_datetime(df["Date"], errors="coerce").dt.strftime("%Y-%m").fillna(UNDATED_MONTH)
+        else:
+            months = pd.Series(UNDATED_MONTH, index=df.index)
+        return sources + "/" + months
+
+    def select(self, sources=None, months=None):
+        """Prune the catalog to the partition keys for the given sources and months"""
+        source_keys = {_source_key(s) for s in sources} if sources is not None else None
+        keys = []
+        for key, entry in self.catalog.items():
+            if source_keys is not None and entry["source"] not in source_keys:
+                continue
+            if months is not None and entry["month"] not in months:
+                continue
+            keys.append(key)
+        return sorted(keys)
+
+    def totals(self, sources=None, months=None):
+        """Sum the catalog entries of the selected partitions without reading any rows"""
+        result = {"rows": 0, "transfers": 0, "inflow": 0.0, "outflow": 0.0}
+        for key in self.select(sources, months):
+            for field in result:
+                result[field] += self.catalog[key][field]
+        result["net"] = result["inflow"] - result["outflow"]
+        return result
+
+    # === READ / WRITE ===
+    def read(self, sources=None, months=None):
+        """Load the transactions of the selected partitions (all of them by default) from one snapshot"""
+        for attempt in range(3):
+            try:
+                frames = [
+                    pd.read_json(self._partition_path(self.catalog[key]), orient="records")
+                    for key in self.select(sources, months)
+                ]
+                break
+            except FileNotFoundError:
+                # The snapshot is older than the retention window - move to the latest one
+                if attempt == 2:
+                    raise
+                self.refresh()
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True)
+
+    def write(self, df, changed=None, base=None):
+        """Persist the master frame, writing new versions of only the partitions listed in changed.
+
+        Without changed every partition is rewritten (used for the first save and migrations).
+        Partitions that no longer have rows are dropped from the catalog.
+        If base (the snapshot df was loaded from) is given and another writer changed one of
+        these partitions since, nothing is committed and StoreConflict is raised.
+        Returns the new catalog snapshot.
+        """
+        keys = self.partition_keys(df)
+        positions = df.groupby(keys.to_numpy()).indices if not df.empty else {}
+        if changed is None:
+            changed = set(positions) | set(self.catalog)
+        changed = set(changed)
+
+        # 1) Write new partition files - unique names, so no lock is needed
+        updates = {}
+        for key in sorted(changed):
+            if key not in positions:
+                updates[key] = None
+                continue
+            partition = df.iloc[positions[key]]
+            source, month = key.split("/", 1)
+            entry = {"source": source, "month": month, "file": f"{source}/{month}.{uuid.uuid4().hex[:12]}.json"}
+            atomic_write(
+                self._partition_path(entry),
+                lambda path, partition=partition: partition.to_json(path, orient="records", date_format="iso")
+            )
+            updates[key] = {**entry, **_totals(partition)}
+
+        # 2) Commit: check for conflicting writers and swap in the new catalog under the lock
+        with FileLock(os.path.join(self.root, LOCK_FILE)):
+            latest = self._load_catalog()
+            if base is not None:
+                conflicts = {
+                    key for key in changed
+                    if latest["partitions"].get(key, {}).get("file") != base["partitions"].get(key, {}).get("file")
+                }
+                if conflicts:
+                    for entry in updates.values():
+                        if entry is not None:
+                            os.remove(self._partition_path(entry))
+                    raise StoreConflict(conflicts)
+            for key, entry in updates.items():
+                if entry is None:
+                    latest["partitions"].pop(key, None)
+                else:
+                    latest["partitions"][key] = entry
+            latest["version"] += 1
+            atomic_write_json(self._catalog_path(), latest, indent=1, sort_keys=True)
+
+        self.snapshot = latest
+        self.collect_garbage()
+        return latest
+
+    def collect_garbage(self, retention=SNAPSHOT_RETENTION_SECONDS):
+        """Delete partition files no longer in the catalog once they are older than retention"""
+        referenced = {self._partition_path(entry) for entry in self.catalog.values()}
+        cutoff = time.time() - retention
+        for source_dir in os.listdir(self.root):
+            directory = os.path.join(self.root, source_dir)
+            if not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                path = os.path.join(directory, name)
+                if name.endswith(".json") and path not in referenced:
+                    try:
+                        if os.path.getmtime(path) < cutoff:
+                            os.remove(path)
+                    except FileNotFoundError:
+                        pass
@@ -0,0 +1,252 @@
+import numpy as np
+import pandas as pd
+from merchant_normalizer import normalize_merchant
+
+# Columns that get a hash index, and amount columns that can be aggregated
+INDEXED_COLUMNS = ("Category", "Source", "Merchant")
+AMOUNT_COLUMNS = ("Inflow", "Outflow", "Amount")
+
+
+def merchant_key(value):
+    """Normalize a merchant string into the key used by the Merchant index"""
+    return normalize_merchant(value)
+
+
+def _as_list(value):
+    if value is None:
+        return None
+    if isinstance(value, (list, tuple, set, np.ndarray, pd.Index)):
+        return list(value)
+    return [value]
+
+
+class TransactionIndex:
+    """Prebuilt indexes over the master transactions for fast ad-hoc queries.
+
+    - a sorted date index (datetime64 values + row positions) for range lookups by binary search
+    - hash indexes mapping Category / Source / normalized Merchant to sorted row positions
+
+    The frame itself is kept as given (e.g. the shared memory-mapped snapshot) and only
+    addressed by position, never copied. include is an optional boolean mask of the rows
+    to index (e.g. everything but transfers); the other rows are never returned.
+    """
+
+    def __init__(self, df, include=None):
+        self.df = df
+        n = len(self.df)
+        included = np.ones(n, dtype=bool) if include is None else np.asarray(include, dtype=bool)
+        self.rows = np.flatnonzero(included)
+
+        # Sorted date index - rows with unparseable dates are left out of range lookups
+        if "Date" in self.df.columns:
+            dates = pd.to_datetime(self.df["Date"], errors="coerce").to_numpy(dtype="datetime64[ns]")
+        else:
+            dates = np.full(n, np.datetime64("NaT"), dtype="datetime64[ns]")
+        self.dates = dates
+        valid = ~np.isnat(dates) & included
+        valid_positions = np.flatnonzero(valid)
+        order = np.argsort(dates[valid], kind="stable")
+        self.date_positions = valid_positions[order]
+        self.sorted_dates = dates[self.date_positions]
+
+        # Hash indexes - value -> sorted int array of row positions.
+        # The per-row codes are kept too so candidates can be filtered without set intersections.
+        self.hash_indexes = {}
+        self.codes = {}
+        self.code_of = {}
+        for column in INDEXED_COLUMNS:
+            if column not in self.df.columns:
+                continue
+            raw_codes, raw_uniques = pd.factorize(self.df[column].astype(str), sort=False)
+            if column == "Merchant":
+                # Normalize each distinct string once, then collapse codes that share a key
+                keys = pd.Index([merchant_key(v) for v in raw_uniques])
+            else:
+                keys = pd.Index(raw_uniques)
+            key_codes, uniques = pd.factorize(keys, sort=False)
+            codes = key_codes[raw_codes] if len(raw_codes) else raw_codes
+            # Rows left out sort into a trailing bucket that no value points to
+            indexed_codes = np.where(included, codes, len(uniques))
+            order = np.argsort(indexed_codes, kind="stable")
+            bounds = np.searchsorted(indexed_codes[order], np.arange(len(uniques) + 1))
+            self.codes[column] = codes
+            self.code_of[column] = {key: code for code, key in enumerate(uniques)}
+            self.hash_indexes[column] = {
+                uniques[i]: order[bounds[i]:bounds[i + 1]] for i in range(len(uniques))
+            }
+
+        # Amount columns as plain float arrays for fast aggregation
+        self.amounts = {}
+        for column in AMOUNT_COLUMNS:
+            if column in self.df.columns:
+                self.amounts[column] = pd.to_numeric(self.df[column], errors="coerce").fillna(0.0).to_numpy(dtype=float)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def values(self, column):
+        """Return the distinct indexed values of a column"""
+        return sorted(key for key, positions in self.hash_indexes.get(column, {}).items() if len(positions))
+
+    def _keys(self, column, values):
+        return [merchant_key(v) if column == "Merchant" else str(v) for v in values]
+
+    def lookup(self, column, values):
+        """Return sorted row positions whose column matches any of the given values"""
+        index = self.hash_indexes.get(column)
+        if index is None:
+            return np.empty(0, dtype=np.intp)
+        hits = [index[k] for k in self._keys(column, values) if k in index]
+        if not hits:
+            return np.empty(0, dtype=np.intp)
+        if len(hits) == 1:
+            return hits[0]
+        return np.sort(np.concatenate(hits))
+
+    def match(self, column, values, positions):
+        """Keep only the positions whose column matches any of the given values"""
+        code_of = self.code_of[column]
+        wanted = [code_of[k] for k in self._keys(column, values) if k in code_of]
+        codes = self.codes[column][positions]
+        if len(wanted) == 1:
+            return positions[codes == wanted[0]]
+        return positions[np.isin(codes, wanted)]
+
+    def date_range(self, start=None, end=None):
+        """Return row positions with start <= Date <= end (end is inclusive of the whole day)"""
+        lo = 0
+        hi = len(self.sorted_dates)
+        if start is not None:
+            lo = np.searchsorted(self.sorted_dates, np.datetime64(pd.Timestamp(start).normalize(), "ns"), side="left")
+        if end is not None:
+            end_exclusive = pd.Timestamp(end).normalize() + pd.Timedelta(days=1)
+            hi = np.searchsorted(self.sorted_dates, np.datetime64(end_exclusive, "ns"), side="left")
+        return self.date_positions[lo:hi]
+
+    def query(self):
+        return TransactionQuery(self)
+
+
+class TransactionQuery:
+    """Composable, immutable query over a TransactionIndex.
+
+    Every filter method returns a new query, so partial queries can be reused:
+
+        q2 = index.query().between("2025-04-01", "2025-06-30")
+        q2.where(Category="Groceries", Source="AMEX").total("Outflow")
+    """
+
+    def __init__(self, index, start=None, end=None, filters=None, predicate=None):
+        self.index = index
+        self.start = start
+        self.end = end
+        self.filters = dict(filters or {})
+        self.predicate = predicate
+
+    def _replace(self, **changes):
+        params = dict(start=self.start, end=self.end, filters=self.filters, predicate=self.predicate)
+        params.update(changes)
+        return TransactionQuery(self.index, **params)
+
+    def between(self, start=None, end=None):
+        """Restrict to a date range (inclusive)"""
+        return self._replace(start=start, end=end)
+
+    def where(self, **filters):
+        """Restrict indexed columns to one or more values, e.g. where(Category="Groceries", Source=["CIBC", "AMEX"])"""
+        merged = dict(self.filters)
+        for column, value in filters.items():
+            values = _as_list(value)
+            if values is None:
+                merged.pop(column, None)
+            elif column in merged:
+                # Repeated filters on the same column intersect
+                merged[column] = [v for v in merged[column] if v in values]
+            else:
+                merged[column] = values
+        return self._replace(filters=merged)
+
+    def filter(self, predicate):
+        """Add a free-form predicate: a function taking the selected rows and returning a boolean mask"""
+        if self.predicate is None:
+            return self._replace(predicate=predicate)
+        previous = self.predicate
+        return self._replace(predicate=lambda rows: previous(rows) & predicate(rows))
+
+    def positions(self):
+        """Resolve the query to sorted row positions using the indexes"""
+        for column in self.filters:
+            if column not in self.index.hash_indexes:
+                raise KeyError(f"Column '{column}' is not indexed")
+        has_dates = self.start is not None or self.end is not None
+
+        # Start from the most selective index, then check the remaining conditions on those rows only
+        candidates = [(column, self.index.lookup(column, values)) for column, values in self.filters.items()]
+        if has_dates:
+            candidates.append(("Date", self.index.date_range(self.start, self.end)))
+
+        if candidates:
+            candidates.sort(key=lambda item: len(item[1]))
+            driver, result = candidates[0]
+            if driver == "Date":
+                result = np.sort(result)
+            for column, values in self.filters.items():
+                if column == driver or len(result) == 0:
+                    continue
+                result = self.index.match(column, values, result)
+            if has_dates and driver != "Date" and len(result):
+                dates = self.index.dates[result]
+                mask = ~np.isnat(dates)
+                if self.start is not None:
+                    mask &= dates >= np.datetime64(pd.Timestamp(self.start).normalize(), "ns")
+                if self.end is not None:
+                    end_exclusive = pd.Timestamp(self.end).normalize() + pd.Timedelta(days=1)
+                    mask &= dates < np.datetime64(end_exclusive, "ns")
+                result = result[mask]
+        else:
+            result = self.index.rows
+
+        if self.predicate is not None and len(result):
+            mask = np.asarray(self.predicate(self.index.df.iloc[result]), dtype=bool)
+            result = result[mask]
+        return result
+
+    def count(self):
+        return len(self.positions())
+
+    def rows(self):
+        """Return the matching transactions as a DataFrame"""
+        return self.index.df.iloc[self.positions()]
+
+    def total(self, column="Outflow"):
+        """Sum an amount column over the matching rows"""
+        if column not in self.index.amounts:
+            return 0.0
+        return float(self.index.amounts[column][self.positions()].sum())
+
+    def group_by(self, by, columns=None):
+        """Aggregate amount columns over the matching rows.
+
+        by may be a column name or one of "Month" / "Week" / "Day" / "Year" for date buckets.
+        Returns a DataFrame with the group key, the summed amount columns and a Count column.
+        """
+        positions = self.positions()
+        columns = [c for c in (columns or AMOUNT_COLUMNS) if c in self.index.amounts]
+
+        if by in ("Year", "Month", "Week", "Day"):
+            freq = {"Year": "Y", "Month": "M", "Week": "W", "Day": "D"}[by]
+            keys = pd.PeriodIndex(pd.DatetimeIndex(self.index.dates[positions]), freq=freq).astype(str)
+        elif by == "Merchant":
+            keys = self.index.df["Merchant"].iloc[positions].map(merchant_key).to_numpy()
+        elif by in self.index.df.columns:
+            keys = self.index.df[by].iloc[positions].astype(str).to_numpy()
+        else:
+            raise KeyError(f"Cannot group by '{by}'")
+
+        data = {by: keys}
+        for column in columns:
+            data[column] = self.index.amounts[column][positions]
+        grouped = pd.DataFrame(data).groupby(by, sort=True)
+        result = grouped[columns].sum() if columns else pd.DataFrame(index=grouped.size().index)
+        result["Count"] = grouped.size()
+        return result.reset_index()
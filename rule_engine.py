@@ -0,0 +1,227 @@
+import re
+import numpy as np
+import pandas as pd
+from merchant_normalizer import normalize_merchants, canonical_keywords
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # optional - without it patterns run through Python's re, one value at a time
+    pa = None
+
+RULES_FILE = "rules.json"
+RULE_FIELDS = {"name", "category", "priority", "merchant", "description", "min_amount", "max_amount", "source", "direction"}
+DIRECTIONS = ("Inflow", "Outflow")
+KEYWORD_PRIORITY = 0
+KEYWORD_RULE_PREFIX = "Keywords: "
+
+
+def _blank(value):
+    """Empty cells from JSON or the rules editor (None, NaN, "") count as "no condition" """
+    if value is None:
+        return True
+    if isinstance(value, str):
+        return not value.strip()
+    if isinstance(value, (list, tuple)):
+        return len(value) == 0
+    return bool(pd.isna(value))
+
+
+def clean_rule(rule):
+    """Drop the empty conditions of a rule (e.g. a rules-editor row) and turn numpy scalars into plain values"""
+    return {
+        field: value.item() if hasattr(value, "item") else value
+        for field, value in rule.items()
+        if field in RULE_FIELDS and not _blank(value)
+    }
+
+
+def keyword_rules(categories):
+    """Turn the category keyword lists into merchant rules at KEYWORD_PRIORITY, in dict order"""
+    rules = []
+    for category, keywords in categories.items():
+        if category == "Uncategorized" or not keywords:
+            continue
+        canonical = canonical_keywords(keywords)
+        if canonical:
+            rules.append({
+                "name": KEYWORD_RULE_PREFIX + category,
+                "category": category,
+                "priority": KEYWORD_PRIORITY,
+                "merchant": "|".join(re.escape(keyword) for keyword in canonical),
+            })
+    return rules
+
+
+def _compile_rule(position, rule):
+    """Validate one rule dict and compile its conditions. Raises ValueError naming the rule."""
+    name = rule.get("name") if not _blank(rule.get("name")) else f"Rule {position + 1}"
+    unknown = set(rule) - RULE_FIELDS
+    if unknown:
+        raise ValueError(f"{name}: unknown field(s) {', '.join(sorted(unknown))}")
+    if _blank(rule.get("category")):
+        raise ValueError(f"{name}: a category is required")
+
+    compiled = {"name": name, "category": rule["category"]}
+    try:
+        compiled["priority"] = int(rule.get("priority") if not _blank(rule.get("priority")) else 0)
+        for field in ("min_amount", "max_amount"):
+            compiled[field] = float(rule[field]) if not _blank(rule.get(field)) else None
+    except (TypeError, ValueError):
+        raise ValueError(f"{name}: priority and amounts must be numbers")
+    for field in ("merchant", "description"):
+        try:
+            compiled[field] = re.compile(rule[field], re.IGNORECASE) if not _blank(rule.get(field)) else None
+        except re.error as e:
+            raise ValueError(f"{name}: invalid {field} pattern ({e})")
+    source = rule.get("source")
+    if _blank(source):
+        compiled["source"] = None
+    else:
+        compiled["source"] = [s.strip() for s in source.split(",")] if isinstance(source, str) else list(source)
+    direction = rule.get("direction")
+    if not _blank(direction) and direction not in DIRECTIONS:
+        raise ValueError(f"{name}: direction must be one of {', '.join(DIRECTIONS)}")
+    compiled["direction"] = None if _blank(direction) else direction
+    return compiled
+
+
+class RuleEngine:
+    """Categorization rules compiled into one vectorized decision pass over a frame.
+
+    A rule is a dict with a name, a category, a priority (higher wins; among equal priorities
+    the later rule wins) and any of these conditions, all of which must hold:
+        merchant                  regex searched in the canonical merchant, case-insensitive
+        description               regex searched in the Description, case-insensitive
+        min_amount / max_amount   bounds on the transaction amount (its Inflow or Outflow)
+        source                    a Source, or a list / comma-separated string of Sources
+        direction                 "Inflow" or "Outflow"
+    Text patterns run once per distinct merchant or description (with pyarrow, through RE2 in
+    C++), after a combined pass has ruled out the values no pattern can match. Each rule's mask
+    is built once with numpy, and rules are resolved from the highest priority down, stopping
+    as soon as every row has a winner.
+    """
+
+    def __init__(self, rules):
+        self.rules = [_compile_rule(position, rule) for position, rule in enumerate(rules)]
+        # Highest priority first; among equal priorities the later rule first
+        self.order = sorted(range(len(self.rules)), key=lambda i: (self.rules[i]["priority"], i), reverse=True)
+
+    def __len__(self):
+        return len(self.rules)
+
+    def _text_matcher(self, values, patterns):
+        """Return match(pattern) -> row mask of the rows whose value matches.
+
+        One combined pass over the distinct values finds those that match any of the patterns;
+        each pattern then searches only those.
+        """
+        codes, uniques = pd.factorize(pd.Series(values), sort=False)
+        uniques = np.array([str(value) for value in uniques], dtype=object)
+        # Missing values get code -1, which picks a trailing never-matching slot
+        codes = np.where(codes < 0, len(uniques), codes)
+        arrow_uniques = pa.array(uniques.tolist(), type=pa.string()) if pa is not None else None
+
+        def search(pattern, positions=None):
+            if arrow_uniques is not None:
+                try:
+                    # RE2 in C++; falls through for syntax RE2 lacks (lookarounds, backreferences)
+                    values = arrow_uniques if positions is None else arrow_uniques.take(pa.array(positions))
+                    return pc.match_substring_regex(values, pattern, ignore_case=True).to_numpy(zero_copy_only=False)
+                except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                    pass
+            compiled = re.compile(pattern, re.IGNORECASE)
+            values = uniques if positions is None else uniques[positions]
+            return np.fromiter((compiled.search(value) is not None for value in values), dtype=bool, count=len(values))
+
+        try:
+            candidates = np.flatnonzero(search("|".join(f"(?:{pattern.pattern})" for pattern in patterns)))
+        except re.error:
+            # Patterns that can't be combined (e.g. inline flags) - search everything
+            candidates = np.arange(len(uniques))
+        cache = {}   # pattern -> row mask
+
+        def match(pattern):
+            if pattern.pattern not in cache:
+                hits = np.zeros(len(uniques) + 1, dtype=bool)
+                if len(candidates):
+                    hits[candidates] = search(pattern.pattern, candidates)
+                cache[pattern.pattern] = hits[codes]
+            return cache[pattern.pattern]
+        return match
+
+    def apply(self, df):
+        """Return the index of the winning rule for every row (-1 where no rule fired) as a numpy array"""
+        n = len(df)
+        winner = np.full(n, -1, dtype=np.int64)
+        if not self.rules or n == 0:
+            return winner
+
+        merchant_patterns = [rule["merchant"] for rule in self.rules if rule["merchant"] is not None]
+        description_patterns = [rule["description"] for rule in self.rules if rule["description"] is not None]
+        merchants = normalize_merchants(df["Merchant"]) if "Merchant" in df.columns else pd.Series("", index=df.index)
+        match_merchant = self._text_matcher(merchants, merchant_patterns) if merchant_patterns else None
+        if description_patterns and "Description" in df.columns:
+            match_description = self._text_matcher(df["Description"], description_patterns)
+        else:
+            match_description = None
+
+        if "Inflow" in df.columns and "Outflow" in df.columns:
+            outflow = pd.to_numeric(df["Outflow"], errors="coerce").fillna(0.0).to_numpy(dtype=float)
+            inflow = pd.to_numeric(df["Inflow"], errors="coerce").fillna(0.0).to_numpy(dtype=float)
+        elif "Amount" in df.columns:
+            # Legacy format - all amounts are outflows
+            outflow = pd.to_numeric(df["Amount"], errors="coerce").fillna(0.0).abs().to_numpy(dtype=float)
+            inflow = np.zeros(n)
+        else:
+            outflow = inflow = np.zeros(n)
+        is_outflow = outflow > 0
+        is_inflow = (inflow > 0) & ~is_outflow
+        amount = np.where(is_outflow, outflow, inflow)
+        if "Source" in df.columns:
+            source_codes, source_values = pd.factorize(df["Source"].astype(str), sort=False)
+        else:
+            source_codes, source_values = np.zeros(n, dtype=np.int64), pd.Index([""])
+
+        source_masks = {}
+
+        def in_sources(sources):
+            key = tuple(sources)
+            if key not in source_masks:
+                allowed = np.zeros(len(source_values) + 1, dtype=bool)
+                allowed[source_values.get_indexer(sources)] = True
+                allowed[-1] = False   # get_indexer marks unknown sources as -1
+                source_masks[key] = allowed[source_codes]
+            return source_masks[key]
+
+        undecided = np.ones(n, dtype=bool)
+        for i in self.order:
+            rule = self.rules[i]
+            if not undecided.any():
+                break
+            mask = undecided.copy()
+            if rule["min_amount"] is not None:
+                mask &= amount >= rule["min_amount"]
+            if rule["max_amount"] is not None:
+                mask &= amount <= rule["max_amount"]
+            if rule["source"] is not None:
+                mask &= in_sources(rule["source"])
+            if rule["direction"] is not None:
+                mask &= is_inflow if rule["direction"] == "Inflow" else is_outflow
+            if rule["merchant"] is not None:
+                mask &= match_merchant(rule["merchant"])
+            if rule["description"] is not None:
+                mask &= match_description(rule["description"]) if match_description else False
+            winner[mask] = i
+            undecided &= ~mask
+        return winner
+
+    def categorize(self, df):
+        """Return (category, rule name) Series aligned with df - None where no rule fired"""
+        winner = self.apply(df)
+        categories = np.array([rule["category"] for rule in self.rules] + [None], dtype=object)
+        names = np.array([rule["name"] for rule in self.rules] + [None], dtype=object)
+        return (
+            pd.Series(categories[winner], index=df.index, dtype=object),
+            pd.Series(names[winner], index=df.index, dtype=object),
+        )
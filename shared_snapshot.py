@@ -0,0 +1,109 @@
+import glob
+import os
+import re
+import time
+import numpy as np
+import pandas as pd
+from partitioned_store import SNAPSHOT_RETENTION_SECONDS
+from storage import FileLock, LockTimeout, atomic_write
+
+try:
+    import pyarrow as pa
+except ImportError:  # optional - without it every process reads the partitions into its own frame
+    pa = None
+
+SNAPSHOT_DIR = ".snapshots"   # "." can't appear in a source directory name, so never collides with one
+PUBLISH_LOCK_FILE = "publish.lock"
+PUBLISH_LOCK_TIMEOUT = 120.0  # building the first snapshot reads every partition
+
+
+def snapshot_path(store, version=None):
+    """Path of the Arrow file for a catalog version (the store's current one by default)"""
+    version = store.version if version is None else version
+    return os.path.join(store.root, SNAPSHOT_DIR, f"master.{version}.arrow")
+
+
+def _string_dtype(arrow_type):
+    # Keep strings in their Arrow buffers; NaN as the missing value like the default object columns
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return pd.StringDtype("pyarrow", na_value=np.nan)
+    return None
+
+
+def _write_arrow(df, path):
+    # Uncompressed IPC file format, so readers can map the buffers instead of decoding them
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def map_snapshot(path):
+    """Map a published snapshot read-only and build a DataFrame on top of it.
+
+    String columns and null-free numeric/date columns point straight into the mapped file;
+    the operating system keeps one copy of its pages however many processes map it.
+    """
+    table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+    return table.to_pandas(split_blocks=True, types_mapper=_string_dtype)
+
+
+def publish_snapshot(store, df):
+    """Publish df as the Arrow snapshot of the store's current version and return the mapped frame.
+
+    df must hold exactly the rows of that version (e.g. the frame just committed on top of
+    the latest snapshot). Returns df itself when pyarrow is missing or Arrow can't hold a column.
+    """
+    if pa is None or df.empty:
+        return df
+    path = snapshot_path(store)
+    if not os.path.exists(path):
+        try:
+            atomic_write(path, lambda temp_path: _write_arrow(df, temp_path))
+        except (pa.ArrowException, TypeError, ValueError):
+            # Mixed-type object columns - keep the private pandas copy
+            return df
+        except PermissionError:
+            # Windows: another process published and mapped this version first
+            pass
+    collect_snapshots(store)
+    return map_snapshot(path)
+
+
+def read_master(store):
+    """Return the master frame of the store's current snapshot, shared between processes when possible.
+
+    The first reader of a version builds its Arrow file from the partitions; every other
+    process (dashboard sessions, the API, background jobs) maps that file instead of loading
+    its own copy. Falls back to store.read() without pyarrow.
+    """
+    if pa is None or not store.catalog:
+        return store.read()
+    path = snapshot_path(store)
+    if os.path.exists(path):
+        return map_snapshot(path)
+    try:
+        with FileLock(os.path.join(store.root, SNAPSHOT_DIR, PUBLISH_LOCK_FILE), timeout=PUBLISH_LOCK_TIMEOUT):
+            # Another process may have published it while we waited for the lock
+            if os.path.exists(snapshot_path(store)):
+                return map_snapshot(snapshot_path(store))
+            return publish_snapshot(store, store.read())
+    except LockTimeout:
+        return store.read()
+
+
+def collect_snapshots(store, retention=SNAPSHOT_RETENTION_SECONDS):
+    """Delete Arrow files of older versions once they are older than retention.
+
+    Processes that still map a deleted file keep their view of it; on Windows the file
+    can't be removed while mapped and is retried on the next publish.
+    """
+    cutoff = time.time() - retention
+    for path in glob.glob(os.path.join(store.root, SNAPSHOT_DIR, "master.*.arrow")):
+        match = re.search(r"master\.(\d+)\.arrow$", path)
+        if not match or int(match.group(1)) >= store.version:
+            continue
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
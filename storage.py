@@ -0,0 +1,131 @@
+import json
+import os
+import stat
+import tempfile
+import time
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+
+# Process umask, for the permissions of files atomic_write creates (os.umask can only be read by setting it)
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+class LockTimeout(Exception):
+    """Raised when an inter-process lock can't be acquired in time"""
+
+
+class FileLock:
+    """Exclusive inter-process lock held on a lock file.
+
+    Uses msvcrt on Windows and flock elsewhere. Only writers take it - readers work
+    from immutable files and atomically replaced catalogs, so they never wait.
+
+        with FileLock("categories.json.lock"):
+            ...
+    """
+
+    def __init__(self, path, timeout=10.0, poll_interval=0.05):
+        self.path = path
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._file = None
+
+    def acquire(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, "a+")
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                if os.name == "nt":
+                    self._file.seek(0)
+                    msvcrt.locking(self._file.fileno(), msvcrt.LK_NBLCK, 1)
+                else:
+                    fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return self
+            except OSError:
+                if time.monotonic() >= deadline:
+                    self._file.close()
+                    self._file = None
+                    raise LockTimeout(f"Timed out waiting for lock {self.path}")
+                time.sleep(self.poll_interval)
+
+    def release(self):
+        if self._file is None:
+            return
+        try:
+            if os.name == "nt":
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+def atomic_write(path, write_func):
+    """Write a file atomically: write_func(temp_path) fills a temp file next to path, which then replaces it.
+
+    Readers see either the old file or the complete new one, never a partial write.
+    The file keeps the permissions of the one it replaces, or gets the umask default like a
+    file created by open() - mkstemp's temp files are owner-only.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix=".tmp-", suffix=os.path.splitext(path)[1], dir=directory)
+    os.close(fd)
+    try:
+        write_func(temp_path)
+        mode = stat.S_IMODE(os.stat(path).st_mode) if os.path.exists(path) else 0o666 & ~_UMASK
+        os.chmod(temp_path, mode)
+        with open(temp_path, "rb+") as f:
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def atomic_write_json(path, data, **json_kwargs):
+    """Atomically replace a JSON file"""
+    def write(temp_path):
+        with open(temp_path, "w") as f:
+            json.dump(data, f, **json_kwargs)
+    atomic_write(path, write)
+
+
+def locked_write_json(path, data, **json_kwargs):
+    """Atomically replace a JSON file while holding its inter-process lock"""
+    with FileLock(path + ".lock"):
+        atomic_write_json(path, data, **json_kwargs)
+
+
+def update_json(path, update, default=None, **json_kwargs):
+    """Read-modify-write a JSON file under its inter-process lock and return the new data.
+
+    update(data) gets the file's current contents (default when it doesn't exist yet) and
+    returns the data to write, so changes made by other processes since our last read are
+    kept instead of overwritten.
+    """
+    with FileLock(path + ".lock"):
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                data = json.load(f)
+        else:
+            data = default
+        data = update(data)
+        atomic_write_json(path, data, **json_kwargs)
+    return data
@@ -0,0 +1,138 @@
+import pandas as pd
+from merchant_normalizer import normalize_merchant, normalize_merchants
+from transaction_matching import exclude_transfers
+
+# === DETECTION CONFIGURATION ===
+# Period name -> (days between charges, allowed deviation in days, minimum number of charges)
+PERIODS = {
+    "Weekly": (7, 2, 4),
+    "Monthly": (30.44, 4, 3),
+    "Annual": (365.25, 15, 2),
+}
+AMOUNT_TOLERANCE = 0.10   # charges within 10% of each other count as the same subscription
+MIN_REGULARITY = 0.75     # share of intervals that must be close to the period
+
+RESULT_COLUMNS = ["Merchant", "Period", "Amount", "Occurrences", "First Charge", "Last Charge",
+                  "Next Charge", "Monthly Cost", "Active"]
+
+
+def _outflows(df):
+    """Return canonical merchant, date and outflow amount for every outflow row"""
+    if "Inflow" in df.columns and "Outflow" in df.columns:
+        amount = pd.to_numeric(df["Outflow"], errors="coerce").fillna(0.0)
+    else:
+        # Legacy format - negative amounts are outflows
+        amount = -pd.to_numeric(df["Amount"], errors="coerce").fillna(0.0)
+    flows = pd.DataFrame({
+        "Merchant": normalize_merchants(df["Merchant"]).to_numpy(),
+        "Date": pd.to_datetime(df["Date"], errors="coerce").dt.normalize().to_numpy(),
+        "Amount": amount.to_numpy(),
+    })
+    return flows[(flows["Amount"] > 0) & flows["Date"].notna() & (flows["Merchant"] != "")]
+
+
+def detect_recurring(df, as_of=None):
+    """Find recurring charges in the transactions.
+
+    Charges are grouped by canonical merchant and split into amount clusters (a new cluster
+    starts when the amount jumps by more than AMOUNT_TOLERANCE). Each cluster's intervals
+    between charges are classified as weekly, monthly or annual when enough of them sit close
+    to the period. Everything is done with sorts, diffs and group aggregates - no row loops.
+    """
+    if df.empty or "Merchant" not in df.columns or "Date" not in df.columns:
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+    as_of = pd.Timestamp(as_of or pd.Timestamp.now()).normalize()
+
+    flows = exclude_transfers(df)
+    flows = _outflows(flows)
+    if flows.empty:
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+
+    # Amount clusters per merchant
+    flows = flows.sort_values(["Merchant", "Amount"], kind="stable")
+    new_merchant = flows["Merchant"].ne(flows["Merchant"].shift())
+    amount_jump = flows["Amount"] > flows["Amount"].shift() * (1 + AMOUNT_TOLERANCE)
+    flows["Cluster"] = (new_merchant | amount_jump).cumsum()
+
+    # Intervals between consecutive charges in each cluster
+    flows = flows.sort_values(["Cluster", "Date"], kind="stable")
+    flows["Interval"] = flows.groupby("Cluster")["Date"].diff().dt.days
+
+    stats = flows.groupby("Cluster").agg(
+        Merchant=("Merchant", "first"),
+        Amount=("Amount", "median"),
+        Occurrences=("Amount", "size"),
+        MinAmount=("Amount", "min"),
+        MaxAmount=("Amount", "max"),
+        FirstCharge=("Date", "min"),
+        LastCharge=("Date", "max"),
+        MedianInterval=("Interval", "median"),
+    )
+
+    # Clusters chained from many different amounts (e.g. groceries) are not one subscription
+    stats = stats[(stats["MaxAmount"] - stats["MinAmount"]) <= stats["Amount"] * 2 * AMOUNT_TOLERANCE]
+
+    # Classify each cluster by its median interval
+    stats["Period"] = None
+    for name, (days, tolerance, min_count) in PERIODS.items():
+        fits = (stats["MedianInterval"] - days).abs() <= tolerance
+        stats.loc[fits & (stats["Occurrences"] >= min_count), "Period"] = name
+    stats = stats[stats["Period"].notna()]
+    if stats.empty:
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+
+    # Regularity: share of intervals within the period's tolerance
+    flows = flows[flows["Cluster"].isin(stats.index)]
+    period_days = flows["Cluster"].map(stats["Period"].map(lambda p: PERIODS[p][0]))
+    period_tolerance = flows["Cluster"].map(stats["Period"].map(lambda p: PERIODS[p][1]))
+    on_time = ((flows["Interval"] - period_days).abs() <= period_tolerance).where(flows["Interval"].notna())
+    stats["Regularity"] = on_time.groupby(flows["Cluster"]).mean()
+    stats = stats[stats["Regularity"] >= MIN_REGULARITY]
+    if stats.empty:
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+
+    # Projected next charge and monthly-equivalent cost
+    next_charge = pd.Series(pd.NaT, index=stats.index, dtype="datetime64[ns]")
+    offsets = {"Weekly": pd.DateOffset(weeks=1), "Monthly": pd.DateOffset(months=1), "Annual": pd.DateOffset(years=1)}
+    for name, offset in offsets.items():
+        is_period = stats["Period"] == name
+        if is_period.any():
+            next_charge[is_period] = stats.loc[is_period, "LastCharge"] + offset
+    days = stats["Period"].map(lambda p: PERIODS[p][0])
+
+    result = pd.DataFrame({
+        "Merchant": stats["Merchant"],
+        "Period": stats["Period"],
+        "Amount": stats["Amount"].round(2),
+        "Occurrences": stats["Occurrences"],
+        "First Charge": stats["FirstCharge"],
+        "Last Charge": stats["LastCharge"],
+        "Next Charge": next_charge,
+        "Monthly Cost": (stats["Amount"] * PERIODS["Monthly"][0] / days).round(2),
+        # A subscription that missed two periods is most likely cancelled
+        "Active": stats["LastCharge"] + pd.to_timedelta(days * 2, unit="D") >= as_of,
+    })
+    return result.sort_values(["Active", "Monthly Cost"], ascending=[False, False]).reset_index(drop=True)
+
+
+def update_recurring(previous, df, merchants, as_of=None):
+    """Re-run detection only for the given merchants and merge with the previous results.
+
+    df is the full master data; only rows of the touched merchants are analysed.
+    """
+    merchants = {normalize_merchant(m) for m in merchants}
+    merchants.discard("")
+    if previous is None:
+        return detect_recurring(df, as_of)
+    if not merchants:
+        return previous
+
+    touched_rows = df[normalize_merchants(df["Merchant"]).isin(merchants).to_numpy()] if "Merchant" in df.columns else df.iloc[0:0]
+    fresh = detect_recurring(touched_rows, as_of)
+    kept = previous[~previous["Merchant"].isin(merchants)]
+    if fresh.empty:
+        return kept.reset_index(drop=True)
+    if kept.empty:
+        return fresh
+    result = pd.concat([kept, fresh], ignore_index=True)
+    return result.sort_values(["Active", "Monthly Cost"], ascending=[False, False]).reset_index(drop=True)
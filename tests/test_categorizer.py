@@ -0,0 +1,53 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from category_model import NaiveBayesCategorizer  # noqa: E402
+from jobs import recategorize_all  # noqa: E402
+from partitioned_store import PartitionedStore  # noqa: E402
+from transactions import prepare_transactions  # noqa: E402
+
+
+def netflix(count, category="Streaming", rule="Keywords: Streaming"):
+    return pd.DataFrame({
+        "Date": pd.date_range("2024-01-15", periods=count, freq="MS").strftime("%Y-%m-%d"),
+        "Description": "NETFLIX.COM",
+        "Merchant": "NETFLIX",
+        "Inflow": 0.0,
+        "Outflow": 16.99,
+        "Source": "CIBC",
+        "Category": category,
+        "Rule": rule,
+    })
+
+
+def test_corrected_merchant_keyword_applies_to_the_next_upload():
+    master = netflix(12)
+    master.loc[11, ["Category", "Rule"]] = ["Entertainment", "Manual"]
+    model = NaiveBayesCategorizer.from_frame(master)
+    # The model still places NETFLIX in Streaming, so the correction becomes a keyword
+    assert not model.knows("NETFLIX", "Entertainment")
+    categories = {"Uncategorized": [], "Streaming": [], "Entertainment": ["NETFLIX"]}
+
+    upload = prepare_transactions(netflix(1).drop(columns=["Category", "Rule"]), categories, model)
+    assert upload["Category"].tolist() == ["Entertainment"]
+    assert upload["Rule"].tolist() == ["Keywords: Entertainment"]
+
+
+def test_recategorize_all_applies_a_moved_keyword(tmp_path):
+    store = PartitionedStore(str(tmp_path))
+    master = netflix(12)
+    master["Date"] = pd.to_datetime(master["Date"])
+    store.write(master)
+    categories = {"Uncategorized": [], "Streaming": [], "Entertainment": ["NETFLIX"]}
+
+    result = recategorize_all(str(tmp_path), categories, lambda fraction, message: None)
+    assert result["changed_rows"] == 12
+    assert set(PartitionedStore(str(tmp_path)).read()["Category"]) == {"Entertainment"}
+
+    # Nothing left to change - the job doesn't rewrite partitions to relabel the Rule
+    result = recategorize_all(str(tmp_path), categories, lambda fraction, message: None)
+    assert result == {"changed_rows": 0, "partitions": 0}
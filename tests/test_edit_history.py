@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from edit_history import EditHistory  # noqa: E402
+
+
+def test_undo_all_stops_at_the_oldest_kept_version():
+    history = EditHistory(pd.DataFrame({"Outflow": [1.0]}), label="Uploaded", max_history=2)
+    for outflow in [4.0, 5.0, 6.0, 7.0]:
+        history.commit(pd.DataFrame({"Outflow": [outflow]}), f"Set {outflow}")
+    while history.can_undo():
+        history.undo()
+
+    # Two edits were dropped, so version 0 is no longer the upload and says so
+    assert history.current["Outflow"].tolist() == [5.0]
+    assert not history.reaches_original()
+    assert history.entries()[0][1:3] == ("Oldest kept version", "Uploaded + 2 older edits")
+
+    history.redo()
+    history.redo()
+    assert history.current["Outflow"].tolist() == [7.0]
@@ -0,0 +1,41 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jobs import recategorize_all  # noqa: E402
+from partitioned_store import PartitionedStore  # noqa: E402
+
+
+def purchases(merchants, day=2):
+    return pd.DataFrame({
+        "Date": pd.to_datetime([f"2025-01-{day + i:02d}" for i in range(len(merchants))]),
+        "Description": merchants,
+        "Merchant": merchants,
+        "Inflow": 0.0,
+        "Outflow": 10.0,
+        "Source": "CIBC",
+        "Category": "Uncategorized",
+        "Rule": "",
+    })
+
+
+def test_recategorize_all_redoes_its_work_after_a_concurrent_append(tmp_path):
+    root = str(tmp_path)
+    PartitionedStore(root).write(purchases(["LOBLAWS", "SHELL"]))
+    categories = {"Uncategorized": [], "Groceries": ["LOBLAWS", "METRO"]}
+    appended = []
+
+    def progress(fraction, message):
+        # Another session appends to the same partition while the job is categorizing
+        if message.startswith("Saving") and not appended:
+            store = PartitionedStore(root)
+            store.write(pd.concat([store.read(), purchases(["METRO"], day=20)], ignore_index=True), base=store.snapshot)
+            appended.append(True)
+
+    result = recategorize_all(root, categories, progress)
+    master = PartitionedStore(root).read().set_index("Merchant")
+    assert result["changed_rows"] == 2
+    assert master["Category"].to_dict() == {"LOBLAWS": "Groceries", "SHELL": "Uncategorized", "METRO": "Groceries"}
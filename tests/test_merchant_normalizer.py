@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from merchant_normalizer import normalize_merchant  # noqa: E402
+
+
+@pytest.mark.parametrize("description, merchant", [
+    ("TIM HORTONS #1234 TORONTO ON", "TIM HORTONS"),
+    ("UBER EATS      TORONTO ON", "UBER EATS"),
+    ("SHOPPERS DRUG MART TORONTO, ON", "SHOPPERS DRUG MART"),
+    ("PETRO-CANADA 1234 CALGARY AB", "PETRO CANADA"),
+    ("NETFLIX.COM 866-579-7172 CA", "NETFLIX"),
+    # A removed date must not leave a space run that reads as a padded location column
+    ("MEC 2025-01-31 REFUND", "MEC REFUND"),
+    # A trailing province-like word is only a location after a comma, city, number or before a postal code
+    ("TOYS R US", "TOYS R US"),
+    ("CARRY ON", "CARRY ON"),
+])
+def test_normalize_merchant(description, merchant):
+    assert normalize_merchant(description) == merchant
@@ -0,0 +1,26 @@
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ofx_importer import read_ofx  # noqa: E402
+
+STATEMENT = b"""OFXHEADER:100
+DATA:OFXSGML
+CHARSET:1252
+
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKACCTFROM><ACCTID>12345</BANKACCTFROM><BANKTRANLIST>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20250102120000[-5:EST]<TRNAMT>-2,50<FITID>1<NAME>TIM HORTONS</STMTTRN>
+<STMTTRN><TRNTYPE>XFER<DTPOSTED>20250103<TRNAMT>500.00<FITID>2<NAME>TRANSFER IN</STMTTRN>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20250102120000[-5:EST]<TRNAMT>-2,50<FITID>1<NAME>TIM HORTONS</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+
+def test_read_ofx_maps_amounts_and_drops_repeated_fitids():
+    df = read_ofx(io.BytesIO(STATEMENT), source="TD")
+    assert df["Outflow"].tolist() == [2.5, 0.0]   # a comma is the decimal separator
+    assert df["Inflow"].tolist() == [0.0, 500.0]
+    assert df["FITID"].tolist() == ["12345:1", "12345:2"]
+    assert df["Type"].tolist() == ["DEBIT", "XFER"]
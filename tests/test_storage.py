@@ -0,0 +1,25 @@
+import os
+import stat
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import storage  # noqa: E402
+
+
+def mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+@pytest.mark.skipif(os.name == "nt", reason="POSIX permissions")
+def test_atomic_write_keeps_normal_file_permissions(tmp_path):
+    path = str(tmp_path / "categories.json")
+    storage.atomic_write_json(path, {})
+    # New files get the umask default, not mkstemp's owner-only mode
+    assert mode(path) == 0o666 & ~storage._UMASK
+
+    os.chmod(path, 0o640)
+    storage.atomic_write_json(path, {"Uncategorized": []})
+    assert mode(path) == 0o640
@@ -0,0 +1,52 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transaction_matching import flag_transfers  # noqa: E402
+from transactions import merge_into_master  # noqa: E402
+
+
+def coffees(dates, source="CIBC"):
+    return pd.DataFrame({
+        "Date": pd.to_datetime(dates),
+        "Description": "TIM HORTONS #1234",
+        "Merchant": "TIM HORTONS",
+        "Inflow": 0.0,
+        "Outflow": 2.50,
+        "Source": source,
+    })
+
+
+def test_back_to_back_statements_keep_every_purchase():
+    merged, _, _, duplicates = merge_into_master(
+        coffees(["2025-01-02", "2025-01-03"]),
+        coffees(["2025-01-04", "2025-01-05"]),
+    )
+    assert duplicates == 0
+    assert len(merged) == 4
+
+
+def test_overlapping_statement_replaces_shifted_duplicates():
+    merged, _, _, duplicates = merge_into_master(
+        coffees(["2025-01-02", "2025-01-06"]),
+        coffees(["2025-01-03", "2025-01-07"]),
+    )
+    # Jan 3 falls inside the existing range and is a shifted copy of Jan 2; Jan 7 is new
+    assert duplicates == 1
+    assert len(merged) == 3
+
+
+def test_transfers_need_payment_or_transfer_evidence():
+    df = pd.DataFrame({
+        "Date": pd.to_datetime(["2025-01-02", "2025-01-03", "2025-01-10", "2025-01-12"]),
+        "Description": ["LOBLAWS #123", "BEST BUY REFUND", "PAYMENT - AMEX", "PAYMENT RECEIVED - THANK YOU"],
+        "Merchant": ["LOBLAWS", "BEST BUY REFUND", "PAYMENT AMEX", "PAYMENT RECEIVED"],
+        "Inflow": [0.0, 49.99, 0.0, 500.0],
+        "Outflow": [49.99, 0.0, 500.0, 0.0],
+        "Source": ["CIBC", "AMEX", "CIBC", "AMEX"],
+    })
+    # A purchase and an unrelated refund of the same amount are not a transfer
+    assert flag_transfers(df).tolist() == [False, False, True, True]
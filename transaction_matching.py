@@ -0,0 +1,195 @@
+import numpy as np
+import pandas as pd
+from merchant_normalizer import normalize_merchants
+
+# === MATCHING CONFIGURATION ===
+DUPLICATE_WINDOW_DAYS = 3   # re-downloaded statements can shift a posting date by a few days
+TRANSFER_WINDOW_DAYS = 5    # a card payment can take a few business days to post on the other account
+# Evidence that a row moves money between own accounts - one leg of a transfer must have it
+TRANSFER_WORDING = r"\b(?:PAYMENT|PAYMT|PYMT|PMT|TRANSFER|XFER|TFR|E-?TRANSFER|THANK YOU)\b"
+TRANSFER_TYPES = ("XFER", "PAYMENT")   # OFX TRNTYPE values
+
+
+def _prepare(df):
+    """Return the matching keys for every row: direction, amount in cents, day number, source and merchant"""
+    if "Inflow" in df.columns and "Outflow" in df.columns:
+        inflow = pd.to_numeric(df["Inflow"], errors="coerce").fillna(0.0)
+        outflow = pd.to_numeric(df["Outflow"], errors="coerce").fillna(0.0)
+        signed = inflow - outflow
+    else:
+        # Legacy format - positive amounts are inflows
+        signed = pd.to_numeric(df["Amount"], errors="coerce").fillna(0.0)
+
+    dates = pd.to_datetime(df["Date"], errors="coerce") if "Date" in df.columns else pd.Series(pd.NaT, index=df.index)
+    keys = pd.DataFrame({
+        "row": df.index,
+        "direction": np.sign(signed.to_numpy()).astype(np.int8),
+        "cents": np.rint(signed.abs().to_numpy() * 100).astype(np.int64),
+        "day": dates.to_numpy(dtype="datetime64[D]").astype(np.int64),
+        "Source": df["Source"].astype(str).to_numpy() if "Source" in df.columns else "",
+        "Merchant": normalize_merchants(df["Merchant"]).to_numpy() if "Merchant" in df.columns else "",
+    })
+    # Rows without a date or an amount can't be matched
+    return keys[dates.notna().to_numpy() & (keys["cents"] > 0).to_numpy()]
+
+
+def _candidate_pairs(left, right, on, window_days):
+    """Block rows on the key columns plus a date bucket, then keep pairs within the date window.
+
+    Buckets are window_days + 1 wide, so two rows within the window are at most one bucket
+    apart. Each left row is only compared with right rows in its own and neighbouring buckets
+    that share the same keys - never all pairs.
+    """
+    width = window_days + 1
+    left = left.assign(bucket=left["day"] // width)
+    right = right.assign(bucket=right["day"] // width)
+    shifted = pd.concat([right.assign(bucket=right["bucket"] + k) for k in (-1, 0, 1)], ignore_index=True)
+
+    pairs = left.merge(shifted, on=list(on) + ["bucket"], suffixes=("_left", "_right"))
+    pairs["gap"] = (pairs["day_right"] - pairs["day_left"]).abs()
+    pairs = pairs[pairs["gap"] <= window_days]
+    return pairs[["row_left", "row_right", "gap"]].rename(columns={"row_left": "left", "row_right": "right"})
+
+
+def _one_to_one(pairs):
+    """Reduce candidate pairs to a one-to-one matching, preferring the closest dates.
+
+    Each round accepts, for every right row, the closest left row that has picked it as
+    its own closest candidate; matched rows are then removed and the rest try again.
+    """
+    pairs = pairs.sort_values(["gap", "left", "right"], kind="stable")
+    matched = []
+    while not pairs.empty:
+        best = pairs.drop_duplicates("left").drop_duplicates("right")
+        matched.append(best)
+        pairs = pairs[~pairs["left"].isin(best["left"]) & ~pairs["right"].isin(best["right"])]
+    if not matched:
+        return pd.DataFrame(columns=["left", "right", "gap"])
+    return pd.concat(matched, ignore_index=True)
+
+
+def match_fitids(existing, incoming):
+    """Pair incoming rows with existing rows that carry the same FITID.
+
+    FITID is the bank's own id of a transaction in OFX/QFX statements (see ofx_importer), so
+    these are the same transaction even when the bank later corrects its date or amount.
+    Returns a DataFrame of (left=existing index, right=incoming index, gap=0).
+    """
+    if "FITID" not in existing.columns or "FITID" not in incoming.columns:
+        return pd.DataFrame(columns=["left", "right", "gap"])
+    left = existing["FITID"].dropna()
+    right = incoming["FITID"].dropna()
+    pairs = pd.DataFrame({"left": left.index, "FITID": left.to_numpy()}).merge(
+        pd.DataFrame({"right": right.index, "FITID": right.to_numpy()}).drop_duplicates("FITID", keep="last"),
+        on="FITID",
+    )
+    return pairs.assign(gap=0)[["left", "right", "gap"]]
+
+
+def match_duplicates(existing, incoming, window_days=DUPLICATE_WINDOW_DAYS):
+    """Pair incoming rows with existing rows they likely duplicate.
+
+    Rows with the same FITID are duplicates outright (match_fitids). Otherwise a duplicate has
+    the same Source, direction, amount in cents and canonical merchant, and the same date -
+    or, for incoming rows dated inside the range the existing rows of their Source already
+    cover (an overlapping statement), a date no more than window_days apart. Rows of a later
+    statement are never matched across the boundary, so a daily coffee on Jan 3 and Jan 4
+    stays two coffees. Two rows that both have a FITID are never fuzzy-matched.
+    Matching is one-to-one, so two identical coffees on the same day only cancel out two
+    existing coffees.
+    Returns a DataFrame of (left=existing index, right=incoming index, gap in days).
+    """
+    if existing.empty or incoming.empty:
+        return pd.DataFrame(columns=["left", "right", "gap"])
+    exact = match_fitids(existing, incoming)
+    if not exact.empty:
+        existing = existing.drop(index=exact["left"])
+        incoming = incoming.drop(index=exact["right"])
+    left, right = _prepare(existing), _prepare(incoming)
+    pairs = _candidate_pairs(left, right, on=["Source", "direction", "cents", "Merchant"], window_days=window_days)
+
+    # Dates may only shift within the period the existing data already covers for the Source
+    covered = left.groupby("Source")["day"].agg(["min", "max"]).reindex(right["Source"])
+    inside = pd.Series(
+        (right["day"].to_numpy() >= covered["min"].to_numpy()) & (right["day"].to_numpy() <= covered["max"].to_numpy()),
+        index=right["row"].to_numpy(),
+    )
+    pairs = pairs[(pairs["gap"] == 0).to_numpy() | inside.loc[pairs["right"]].to_numpy()]
+    if "FITID" in existing.columns and "FITID" in incoming.columns:
+        both_have_ids = (
+            existing["FITID"].loc[pairs["left"]].notna().to_numpy()
+            & incoming["FITID"].loc[pairs["right"]].notna().to_numpy()
+        )
+        pairs = pairs[~both_have_ids]
+    fuzzy = _one_to_one(pairs)
+    return pd.concat([exact, fuzzy], ignore_index=True) if not exact.empty else fuzzy
+
+
+def transfer_evidence(df):
+    """Return a boolean Series marking rows that say they move money between accounts.
+
+    Payment or transfer wording in the canonical merchant or description, or an OFX
+    Type of XFER/PAYMENT. Each distinct text is searched once.
+    """
+    text = np.full(len(df), "", dtype=object)
+    for column in ["Merchant", "Description"]:
+        if column in df.columns:
+            text = text + " " + df[column].fillna("").astype(str).to_numpy(dtype=object)
+    codes, uniques = pd.factorize(text, sort=False)
+    evidence = pd.Series(uniques).str.contains(TRANSFER_WORDING, case=False, regex=True).to_numpy()[codes]
+    if "Type" in df.columns:
+        evidence = evidence | df["Type"].fillna("").astype(str).str.upper().isin(TRANSFER_TYPES).to_numpy()
+    return pd.Series(evidence, index=df.index)
+
+
+def match_transfers(df, window_days=TRANSFER_WINDOW_DAYS):
+    """Pair outflows with inflows of the same amount on a different account within window_days.
+
+    This catches card payments (CIBC outflow + AMEX credit) and moves between accounts.
+    At least one leg must carry transfer evidence (see transfer_evidence), so an unrelated
+    purchase and refund of the same amount are left alone.
+    Returns a DataFrame of (left=outflow index, right=inflow index, gap in days).
+    """
+    if df.empty:
+        return pd.DataFrame(columns=["left", "right", "gap"])
+    keys = _prepare(df)
+    outflows = keys[keys["direction"] < 0]
+    inflows = keys[keys["direction"] > 0]
+    pairs = _candidate_pairs(outflows, inflows, on=["cents"], window_days=window_days)
+
+    # Only money moving between two different accounts is a transfer
+    sources = keys.set_index("row")["Source"]
+    pairs = pairs[sources.loc[pairs["left"]].to_numpy() != sources.loc[pairs["right"]].to_numpy()]
+
+    # ... and only when one side says so; evidence is checked for the candidate rows alone
+    candidates = pd.Index(pairs["left"]).append(pd.Index(pairs["right"])).unique()
+    evidence = transfer_evidence(df.loc[candidates])
+    pairs = pairs[evidence.loc[pairs["left"]].to_numpy() | evidence.loc[pairs["right"]].to_numpy()]
+    return _one_to_one(pairs)
+
+
+def flag_transfers(df, window_days=TRANSFER_WINDOW_DAYS):
+    """Return a boolean Series marking both legs of every matched transfer"""
+    pairs = match_transfers(df, window_days)
+    flags = pd.Series(False, index=df.index)
+    flags.loc[pairs["left"]] = True
+    flags.loc[pairs["right"]] = True
+    return flags
+
+
+def non_transfer_mask(df):
+    """Boolean array marking the rows that are not flagged as transfers"""
+    if "Transfer" not in df.columns:
+        return np.ones(len(df), dtype=bool)
+    return ~df["Transfer"].fillna(False).astype(bool).to_numpy()
+
+
+def exclude_transfers(df):
+    """Drop rows flagged as transfers so they don't count towards Inflow/Outflow totals.
+
+    This copies the kept rows; to index or aggregate a shared frame in place, pass
+    non_transfer_mask(df) along instead.
+    """
+    if "Transfer" not in df.columns:
+        return df
+    return df[non_transfer_mask(df)]
@@ -0,0 +1,88 @@
+import pandas as pd
+from categorizer import categorize_frame
+from date_parsing import parse_dates
+from merchant_normalizer import canonical_merchant_column
+from ofx_importer import is_ofx, read_ofx
+from transaction_matching import match_duplicates, flag_transfers
+
+
+def read_statement(file, name=None):
+    """Read a cleaned statement CSV or an OFX/QFX download (by file extension) into a DataFrame.
+
+    file is a path or a file object; name gives the file name when file is an upload.
+    """
+    if is_ofx(name or getattr(file, "name", file)):
+        return read_ofx(file)
+    return pd.read_csv(file)
+
+
+def prepare_transactions(df, categories, model=None, profiles=None, rules=None):
+    """Bring a cleaned statement into the app schema (Date, Inflow, Outflow, canonical Merchant) and categorize it.
+
+    model is an optional NaiveBayesCategorizer used ahead of the keyword rules, and profiles
+    an optional SourceProfiles holding the known date format of each Source. rules are the
+    explicit categorization rules (see RuleEngine).
+    Raises ValueError for unsupported formats.
+    """
+    # Convert Date column to datetime if it exists, with each source's explicit format
+    if "Date" in df.columns:
+        df["Date"] = profiles.parse_frame(df) if profiles is not None else parse_dates(df["Date"])
+    
+    # Handle different CSV formats
+    if "Inflow" in df.columns and "Outflow" in df.columns:
+        # New format with separate Inflow/Outflow columns
+        pass  # Keep as is
+    elif "Amount" in df.columns:
+        # Legacy format - convert to separate columns
+        amount = pd.to_numeric(df["Amount"], errors="coerce").fillna(0)
+        df["Inflow"] = amount.clip(lower=0)
+        df["Outflow"] = (-amount).clip(lower=0)
+    else:
+        raise ValueError("Unsupported CSV format. Expected columns: Date, Description, Inflow, Outflow")
+
+    # Canonical merchant names - derive them from the description when there is no Merchant column
+    merchants = canonical_merchant_column(df)
+    if merchants is None:
+        raise ValueError("Unsupported CSV format. Expected a Merchant or Description column")
+    df["Merchant"] = merchants
+
+    return categorize_frame(df, categories, model, rules)
+
+
+def merge_into_master(existing_df, incoming_df):
+    """Merge new transactions into the master data.
+
+    Existing rows that the incoming rows duplicate (same FITID, or same source, amount and
+    canonical merchant within a few days - e.g. overlapping statements) are replaced, so
+    importing a statement twice changes nothing, and transfer flags are
+    recomputed. Returns (merged_df, old_rows_df, new_rows_df, duplicate_count), where the
+    old/new row frames hold only the rows that changed: replaced duplicates, new rows and
+    existing rows whose transfer flag changed.
+    """
+    existing_df = existing_df.reset_index(drop=True)
+    incoming_df = incoming_df.reset_index(drop=True)
+
+    if existing_df.empty:
+        # No existing data, just save the incoming rows
+        kept_df = removed_df = existing_df
+        merged_df = incoming_df.copy()
+        duplicate_count = 0
+    else:
+        duplicates = match_duplicates(existing_df, incoming_df)
+        removed_df = existing_df.loc[duplicates["left"]]
+        kept_df = existing_df.drop(index=duplicates["left"])
+        merged_df = pd.concat([kept_df, incoming_df], ignore_index=True)
+        duplicate_count = len(duplicates)
+
+    # Flag both legs of inter-account transfers (e.g. card payments) so totals can skip them
+    merged_df["Transfer"] = flag_transfers(merged_df)
+
+    if "Transfer" in kept_df.columns:
+        old_flags = kept_df["Transfer"].fillna(False).astype(bool).to_numpy()
+    else:
+        old_flags = pd.Series(False, index=kept_df.index).to_numpy()
+    kept_merged_df = merged_df.iloc[:len(kept_df)]
+    reflagged = old_flags != kept_merged_df["Transfer"].to_numpy()
+    old_rows_df = pd.concat([removed_df, kept_df[reflagged]])
+    new_rows_df = pd.concat([kept_merged_df[reflagged], merged_df.iloc[len(kept_df):]])
+    return merged_df, old_rows_df, new_rows_df, duplicate_count
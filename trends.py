@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+
+# Granularities in order from finest to coarsest: name -> (pandas period frequency, approx days per point)
+GRANULARITIES = {
+    "Daily": ("D", 1),
+    "Weekly": ("W", 7),
+    "Monthly": ("M", 30.44),
+}
+MAX_POINTS = 400
+
+
+def _flows(df, include=None):
+    """Return Date, Category, Inflow and Outflow for the (included) master rows, handling the legacy Amount format"""
+    flows = pd.DataFrame({"Date": pd.to_datetime(df["Date"], errors="coerce")})
+    flows["Category"] = df["Category"].astype(str) if "Category" in df.columns else "Uncategorized"
+    if "Inflow" in df.columns and "Outflow" in df.columns:
+        flows["Inflow"] = pd.to_numeric(df["Inflow"], errors="coerce").fillna(0.0)
+        flows["Outflow"] = pd.to_numeric(df["Outflow"], errors="coerce").fillna(0.0)
+    else:
+        # Legacy format - treat all amounts as outflows
+        flows["Inflow"] = 0.0
+        flows["Outflow"] = pd.to_numeric(df["Amount"], errors="coerce").fillna(0.0).abs()
+    if include is not None:
+        flows = flows[include]
+    return flows.dropna(subset=["Date"])
+
+
+def build_rollups(df, include=None):
+    """Pre-aggregate the master transactions into per-category series at every granularity.
+
+    Each rollup has one row per (Period, Category) with the period start date,
+    summed Inflow/Outflow and Net = Inflow - Outflow. Its size depends on the
+    number of periods and categories, not on the number of transactions.
+    include is an optional boolean mask of the rows to count (e.g. non_transfer_mask).
+    """
+    rollups = {}
+    if df.empty or "Date" not in df.columns:
+        return rollups
+
+    flows = _flows(df, include)
+    if flows.empty:
+        return rollups
+
+    # Daily is built from the transactions, coarser levels are built from the daily rollup
+    flows["Period"] = flows["Date"].dt.normalize()
+    daily = flows.groupby(["Period", "Category"], sort=True)[["Inflow", "Outflow"]].sum().reset_index()
+    for name, (freq, _) in GRANULARITIES.items():
+        if freq == "D":
+            rollup = daily.copy()
+        else:
+            periods = daily["Period"].dt.to_period(freq).dt.start_time
+            rollup = (
+                daily.assign(Period=periods)
+                .groupby(["Period", "Category"], sort=True)[["Inflow", "Outflow"]]
+                .sum()
+                .reset_index()
+            )
+        rollup["Net"] = rollup["Inflow"] - rollup["Outflow"]
+        rollups[name] = rollup
+    return rollups
+
+
+def pick_granularity(start, end, max_points=MAX_POINTS):
+    """Pick the finest granularity that keeps a series within max_points for the given date span"""
+    span_days = max((pd.Timestamp(end) - pd.Timestamp(start)).days + 1, 1)
+    for name, (_, days_per_point) in GRANULARITIES.items():
+        if span_days / days_per_point <= max_points:
+            return name
+    return list(GRANULARITIES)[-1]
+
+
+def trend_series(rollups, start, end, granularity="Auto", categories=None, by_category=True):
+    """Slice a rollup to a date range and return (granularity, series).
+
+    With by_category=False the categories are summed into one total series.
+    """
+    if granularity == "Auto":
+        granularity = pick_granularity(start, end)
+    rollup = rollups.get(granularity)
+    if rollup is None:
+        return granularity, pd.DataFrame(columns=["Period", "Category", "Inflow", "Outflow", "Net"])
+
+    # Rollups are sorted by Period, so the date range is a contiguous slice
+    periods = rollup["Period"].to_numpy()
+    start_period = pd.Timestamp(start).to_period(GRANULARITIES[granularity][0]).start_time
+    lo = np.searchsorted(periods, np.datetime64(start_period), side="left")
+    hi = np.searchsorted(periods, np.datetime64(pd.Timestamp(end)), side="right")
+    series = rollup.iloc[lo:hi]
+
+    if categories:
+        series = series[series["Category"].isin(categories)]
+    if not by_category:
+        series = series.groupby("Period", sort=True)[["Inflow", "Outflow", "Net"]].sum().reset_index()
+    return granularity, series.reset_index(drop=True)